@@ -0,0 +1,79 @@
+"""
+Startup-time benchmark for the print server process
+
+Each run starts a fresh interpreter and measures:
+- Django setup (settings, app registry, PrinterConfig.ready)
+- Importing the URL configuration and views
+- The first request served through the WSGI handler
+
+Also reports which heavy optional modules ended up loaded, so regressions
+that pull qrcode/PIL back onto the startup path are easy to spot.
+
+Usage:
+    python benchmarks/startup.py [--runs N]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['qrcode', 'PIL', 'win32print', 'win32api']
+
+CHILD_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+import_done = time.perf_counter()
+from django.test import Client
+response = Client().get('/api/printer-status/')
+request_done = time.perf_counter()
+print(json.dumps({
+    'setup': setup_done - start,
+    'import': import_done - start,
+    'first_request': request_done - start,
+    'status_code': response.status_code,
+    'loaded': [name for name in %r if name in sys.modules],
+}))
+''' % (HEAVY_MODULES,)
+
+
+def run_once():
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='print_server.settings')
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT],
+        cwd=BASE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=10, help='number of fresh processes to time')
+    args = parser.parse_args()
+    
+    samples = [run_once() for _ in range(args.runs)]
+    
+    for key in ['setup', 'import', 'first_request']:
+        values = [sample[key] * 1000 for sample in samples]
+        print(f"{key:>14}: median {statistics.median(values):7.1f} ms  "
+              f"min {min(values):7.1f} ms  max {max(values):7.1f} ms")
+    
+    loaded = sorted({name for sample in samples for name in sample['loaded']})
+    print(f"{'heavy modules':>14}: {', '.join(loaded) if loaded else 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -29,6 +29,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
+    'printer.middleware.StaticAssetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -63,7 +65,7 @@ WSGI_APPLICATION = 'print_server.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.environ.get('PRINT_SERVER_DB', os.path.join(BASE_DIR, 'db.sqlite3')),
     }
 }
 
@@ -97,14 +99,43 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# collectstatic fingerprints file names and writes .gz/.br variants, which
+# printer.middleware.StaticAssetMiddleware serves with immutable caching
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'printer.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Media files (User uploaded files)
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = os.environ.get('PRINT_SERVER_MEDIA', os.path.join(BASE_DIR, 'media'))
 
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10 MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10 MB
 
+# Printer health history (see printer/health.py)
+PRINTER_HEALTH_SAMPLES = 720  # ring buffer size per printer, about an hour at 5 s polling
+PRINTER_HEALTH_MIN_INTERVAL = 5  # seconds between unchanged samples
+PRINTER_HEALTH_WINDOW = 300  # seconds of history the dispatcher looks at
+PRINTER_HEALTH_MAX_ERROR_RATE = 0.5  # skip printers unhealthy for this share of the window
+PRINTER_HEALTH_MAX_ERROR_EVENTS = 24  # drops into error per hour that count as flapping
+PRINTER_HEALTH_MIN_SAMPLES = 3
+
+# Background batch jobs (see printer/tasks.py)
+PRINTER_TASK_BATCH_SIZE = 500
+PRINTER_TASKS_EAGER = False  # run batch jobs inline instead of on the worker thread
+
+# Multi-node coordination (see printer/coordination.py)
+PRINTER_SHARED_QUEUE = False  # enqueue jobs for print nodes instead of printing in-process
+PRINTER_NODE_HEARTBEAT = 10  # seconds between node heartbeats / queue polls
+PRINTER_NODE_LEASE = 60  # seconds a claimed job stays leased without a heartbeat
+PRINTER_JOB_MAX_ATTEMPTS = 3
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
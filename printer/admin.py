@@ -1,12 +1,103 @@
-from django.contrib import admin
-from .models import PrintHistory
+import hashlib
+
+from django.contrib import admin, messages
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from . import tasks
+from .models import PrintHistory, PrintJob, PrintNode
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator that avoids running COUNT(*) over a large table on every page view
+    
+    Unfiltered lists on PostgreSQL use the planner's row estimate once the
+    table is big enough for exact numbers not to matter; every other count
+    is computed once and cached for ``cache_timeout`` seconds.
+    """
+    
+    estimate_threshold = 100000
+    cache_timeout = 60
+    
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        
+        estimate = self.estimated_count(queryset)
+        if estimate is not None and estimate >= self.estimate_threshold:
+            return estimate
+        
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        key = 'printer:admin-count:' + hashlib.md5(f'{sql}{params}'.encode()).hexdigest()
+        return cache.get_or_set(key, queryset.count, self.cache_timeout)
+    
+    @staticmethod
+    def estimated_count(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql' or queryset.query.where:
+            return None
+        
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        return row[0] if row and row[0] > 0 else None
 
 
 @admin.register(PrintHistory)
 class PrintHistoryAdmin(admin.ModelAdmin):
     list_display = ['filename', 'timestamp', 'status', 'printer_name', 'copies', 'file_size']
     list_filter = ['status', 'timestamp', 'printer_name']
-    search_fields = ['filename', 'printer_name', 'error_message']
+    # Prefix lookups: filename search uses its pattern-ops index on PostgreSQL.
+    # ip_address (inet) prefix search is still a scan, but avoids '%x%' LIKEs.
+    search_fields = ['filename__startswith', 'ip_address__startswith']
     readonly_fields = ['timestamp']
     date_hierarchy = 'timestamp'
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+    actions = ['reprint_selected', 'mark_failed_selected', 'purge_files_selected']
+    
+    def queue_batch(self, request, queryset, func, verb):
+        ids = list(queryset.values_list('pk', flat=True))
+        tasks.submit(func, ids)
+        self.message_user(
+            request,
+            f'{verb} {len(ids)} record(s) in the background.',
+            messages.SUCCESS
+        )
+    
+    @admin.action(description='Reprint selected files')
+    def reprint_selected(self, request, queryset):
+        self.queue_batch(request, queryset, tasks.reprint, 'Reprinting')
+    
+    @admin.action(description='Mark selected as failed')
+    def mark_failed_selected(self, request, queryset):
+        self.queue_batch(request, queryset, tasks.mark_failed, 'Marking as failed')
+    
+    @admin.action(description='Delete stored files of selected')
+    def purge_files_selected(self, request, queryset):
+        self.queue_batch(request, queryset, tasks.purge_files, 'Purging files of')
+
+
+@admin.register(PrintNode)
+class PrintNodeAdmin(admin.ModelAdmin):
+    list_display = ['name', 'printers', 'started_at', 'last_heartbeat']
+    readonly_fields = ['started_at', 'last_heartbeat']
+
 
+@admin.register(PrintJob)
+class PrintJobAdmin(admin.ModelAdmin):
+    list_display = ['history', 'printer_name', 'status', 'node', 'attempts', 'lease_expires_at', 'created_at']
+    list_filter = ['status', 'printer_name', 'node']
+    list_select_related = ['history', 'node']
+    raw_id_fields = ['history']
+    paginator = CachedCountPaginator
+    show_full_result_count = False
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class PrinterConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'printer'
+    
+    def ready(self):
+        # Pick the printer backend once per process rather than on first import
+        from . import printer_utils
+        printer_utils.load_backend()
@@ -0,0 +1,259 @@
+"""
+Multi-node print server coordination
+
+Several print nodes, each attached to its own printers, share one database.
+The front end enqueues PrintJob rows (PRINTER_SHARED_QUEUE = True) for a
+printer that a live node serves, and each node runs ``manage.py
+run_print_node`` to:
+
+- register itself and the printers it serves,
+- send heartbeats that also extend the leases on jobs it holds,
+- sample its printers' status for the health history (printer.health),
+- claim queued jobs for its printers under a time-limited lease, leaving
+  jobs for printers that are flapping (printer.health) queued until they
+  settle,
+- print them and report the outcome back to PrintHistory.
+
+Claiming uses SELECT ... FOR UPDATE SKIP LOCKED where the database supports
+it (PostgreSQL, MySQL 8). SQLite has no row locks, so a claim there is a
+compare-and-set UPDATE on the job's status that acts as an advisory lock:
+only the node whose UPDATE matched the still-queued row owns the job.
+
+Jobs whose lease runs out, because their node stopped heartbeating, are put
+back in the queue for another node, up to PRINTER_JOB_MAX_ATTEMPTS. Delivery
+is therefore at least once: a node that stalls past its lease may see its
+job printed again elsewhere. Queued jobs for a printer that no live node
+serves any more are failed rather than left waiting.
+
+Stored files are read from MEDIA_ROOT, which every node must be able to
+reach (e.g. a shared network path).
+"""
+
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .health import health_monitor
+from .models import PrintHistory, PrintJob, PrintNode
+from .printer_utils import PrinterManager
+
+
+def lease_duration():
+    return timedelta(seconds=getattr(settings, 'PRINTER_NODE_LEASE', 60))
+
+
+def register_node(name, printers):
+    """Create or refresh a node and the printers it serves"""
+    # Plain UPDATE/INSERT rather than update_or_create: its SELECT ... then
+    # write transaction deadlocks between concurrently starting SQLite nodes
+    fields = {'printers': list(printers), 'started_at': timezone.now(), 'last_heartbeat': timezone.now()}
+    if not PrintNode.objects.filter(name=name).update(**fields):
+        try:
+            with transaction.atomic():
+                return PrintNode.objects.create(name=name, **fields)
+        except IntegrityError:
+            # Another process registered the same name first
+            PrintNode.objects.filter(name=name).update(**fields)
+    return PrintNode.objects.get(name=name)
+
+
+def live_nodes():
+    """Nodes that have heartbeated within the last lease period"""
+    return PrintNode.objects.filter(last_heartbeat__gte=timezone.now() - lease_duration())
+
+
+def live_printers():
+    """Names of the printers served by at least one live node"""
+    return {printer for printers in live_nodes().values_list('printers', flat=True) for printer in printers}
+
+
+def enqueue(record, printer_name=None):
+    """Queue a history record for a printer that a live node serves
+    
+    An explicitly requested ``printer_name`` must be served. Otherwise the
+    record's own printer is used if it is served, falling back to the live
+    printer with the fewest queued jobs. Returns (success, message); when
+    no node can take the job the record is failed instead.
+    """
+    fail_orphaned_jobs()
+    printers = live_printers()
+    
+    if printer_name and printer_name not in printers:
+        target = None
+        message = f'No print node is serving {printer_name}'
+    elif printer_name or record.printer_name in printers:
+        target = printer_name or record.printer_name
+    elif printers:
+        queued = dict(
+            PrintJob.objects.filter(status='queued', printer_name__in=printers)
+            .order_by().values_list('printer_name').annotate(Count('pk'))
+        )
+        target = min(sorted(printers), key=lambda printer: queued.get(printer, 0))
+    else:
+        target = None
+        message = 'No print node is online'
+    
+    if target is None:
+        record.status = 'failed'
+        record.error_message = message
+        record.save(update_fields=['status', 'error_message'])
+        return False, message
+    
+    record.printer_name = target
+    record.save(update_fields=['printer_name'])
+    PrintJob.objects.create(history=record, printer_name=target)
+    return True, 'Job queued for printing'
+
+
+def fail_orphaned_jobs():
+    """Fail queued jobs for printers that no live node serves any more"""
+    orphaned = PrintJob.objects.filter(status='queued').exclude(printer_name__in=live_printers())
+    history_ids = list(orphaned.values_list('history_id', flat=True))
+    if not history_ids:
+        return 0
+    
+    failed = orphaned.filter(history_id__in=history_ids).update(status='failed')
+    PrintHistory.objects.filter(pk__in=history_ids, status='pending', jobs__status='failed').update(
+        status='failed', error_message='No print node is serving this printer'
+    )
+    return failed
+
+
+def heartbeat(node):
+    """Mark the node alive and extend the leases on the jobs it holds"""
+    now = timezone.now()
+    PrintNode.objects.filter(pk=node.pk).update(last_heartbeat=now)
+    return PrintJob.objects.filter(node=node, status='claimed').update(
+        lease_expires_at=now + lease_duration()
+    )
+
+
+def claim_jobs(node, limit=1):
+    """Claim up to ``limit`` queued jobs for the node's printers that are not flapping"""
+    printers = [printer for printer in node.printers if not health_monitor.is_flapping(printer)]
+    queued = PrintJob.objects.filter(status='queued', printer_name__in=printers)
+    connection = connections[router.db_for_write(PrintJob)]
+    
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            jobs = list(
+                queued.select_for_update(skip_locked=True).order_by('created_at')[:limit]
+            )
+            for job in jobs:
+                lease(job, node)
+    else:
+        jobs = []
+        # Over-fetch so a few lost races still leave enough candidates
+        for job in list(queued.order_by('created_at')[:limit * 4]):
+            if len(jobs) == limit:
+                break
+            if lease(job, node, expected_status='queued'):
+                jobs.append(job)
+    
+    if jobs:
+        PrintHistory.objects.filter(pk__in=[job.history_id for job in jobs]).update(status='printing')
+    return jobs
+
+
+def lease(job, node, expected_status=None):
+    """Assign the job to the node; with expected_status, only if it still has it"""
+    expires = timezone.now() + lease_duration()
+    jobs = PrintJob.objects.filter(pk=job.pk)
+    if expected_status:
+        jobs = jobs.filter(status=expected_status)
+    
+    if not jobs.update(status='claimed', node=node, lease_expires_at=expires,
+                       attempts=F('attempts') + 1):
+        return False
+    
+    job.status = 'claimed'
+    job.node = node
+    job.lease_expires_at = expires
+    job.attempts += 1
+    return True
+
+
+def complete_job(job, node, success, message=None, spooler_job_id=None):
+    """Record the outcome of a job; ignored if the node no longer holds it"""
+    status = 'completed' if success else 'failed'
+    # One transaction so a node stopped in between never leaves the two out of step
+    with transaction.atomic():
+        updated = PrintJob.objects.filter(pk=job.pk, node=node, status='claimed').update(
+            status=status, lease_expires_at=None
+        )
+        if updated:
+            PrintHistory.objects.filter(pk=job.history_id).update(
+                status=status, error_message=None if success else message, job_id=spooler_job_id
+            )
+    return bool(updated)
+
+
+def defer_job(job, node):
+    """Put a claimed job back in the queue without using up an attempt"""
+    deferred = PrintJob.objects.filter(pk=job.pk, node=node, status='claimed').update(
+        status='queued', node=None, lease_expires_at=None, attempts=F('attempts') - 1
+    )
+    if deferred:
+        PrintHistory.objects.filter(pk=job.history_id).update(status='pending')
+    return bool(deferred)
+
+
+def reclaim_expired_jobs():
+    """Requeue jobs whose lease ran out, failing those out of attempts"""
+    now = timezone.now()
+    max_attempts = getattr(settings, 'PRINTER_JOB_MAX_ATTEMPTS', 3)
+    expired = PrintJob.objects.filter(status='claimed', lease_expires_at__lt=now)
+    
+    exhausted = list(expired.filter(attempts__gte=max_attempts).values_list('pk', 'history_id'))
+    if exhausted:
+        expired.filter(pk__in=[pk for pk, _ in exhausted]).update(
+            status='failed', lease_expires_at=None
+        )
+        PrintHistory.objects.filter(pk__in=[history_id for _, history_id in exhausted]).update(
+            status='failed', error_message='Print node stopped responding'
+        )
+    
+    requeued = expired.filter(attempts__lt=max_attempts).update(
+        status='queued', node=None, lease_expires_at=None
+    )
+    if requeued:
+        PrintHistory.objects.filter(jobs__status='queued', status='printing').update(status='pending')
+    return requeued
+
+
+def process_job(job, node):
+    """Print a claimed job on this node and record the result
+    
+    Returns True once the outcome is recorded. Returns False if the node no
+    longer holds the job, or if its printer started flapping after the
+    claim, in which case the job goes back in the queue unprinted.
+    """
+    if health_monitor.is_flapping(job.printer_name):
+        defer_job(job, node)
+        return False
+    
+    history = job.history
+    if not history.file_path:
+        return complete_job(job, node, False, 'No stored file for this job')
+    
+    path = os.path.join(settings.MEDIA_ROOT, history.file_path.name)
+    success, message = PrinterManager.print_file(path, history.copies, printer_name=job.printer_name)
+    spooler_job_id = history.find_spooled_job(job.printer_name) if success else None
+    return complete_job(job, node, success, message, spooler_job_id)
+
+
+def run_once(node, limit=1):
+    """One coordination cycle: heartbeat, sample printers, reclaim, claim and print"""
+    heartbeat(node)
+    # Feed the health history so print_file can skip flapping printers here too
+    for printer_name in node.printers:
+        PrinterManager.get_printer_status(printer_name)
+    reclaim_expired_jobs()
+    fail_orphaned_jobs()
+    jobs = claim_jobs(node, limit)
+    # Deferred jobs do not count, so --once nodes stop instead of spinning on them
+    return sum(1 for job in jobs if process_job(job, node))
@@ -30,6 +30,13 @@ class PrintFileForm(forms.Form):
         })
     )
     
+    printer = forms.CharField(
+        label='Printer',
+        required=False,
+        max_length=255,
+        help_text='Leave empty to use the default printer',
+    )
+    
     def clean_file(self):
         file = self.cleaned_data.get('file')
         
@@ -47,3 +54,14 @@ class PrintFileForm(forms.Form):
                 )
         
         return file
+
+
+class ReprintForm(forms.Form):
+    """Form for reprinting a file from print history"""
+    
+    copies = forms.IntegerField(
+        label='Number of copies',
+        required=False,
+        min_value=1,
+        max_value=10,
+    )
@@ -0,0 +1,187 @@
+"""
+Printer health history
+
+Keeps a fixed-size ring buffer of status samples per printer, backed by
+``array`` columns at 17 bytes per sample: the default PRINTER_HEALTH_SAMPLES
+of 720 (about an hour at 5 s polling) is roughly 12 KB per printer.
+From the samples it derives uptime, error frequency and job throughput,
+which the dashboard exposes and the dispatcher uses to skip printers that
+keep dropping in and out of an error state.
+
+The history is kept in process memory and is not shared. Every web worker
+and every print node samples and judges its printers on its own, and the
+history is lost when the process restarts.
+"""
+
+import threading
+import time
+from array import array
+
+from django.conf import settings
+
+
+# Status names reported by PrinterManager.get_printer_status(), stored as bytes
+STATUS_CODES = {'online': 0, 'paused': 1, 'offline': 2, 'error': 3}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+UNHEALTHY_CODES = (STATUS_CODES['offline'], STATUS_CODES['error'])
+
+
+class StatusRingBuffer:
+    """Fixed-capacity time series of (timestamp, status, dispatched jobs)"""
+    
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.statuses = array('b', bytes(capacity))
+        self.dispatched = array('q', bytes(8 * capacity))
+        self.start = 0
+        self.count = 0
+    
+    def __len__(self):
+        return self.count
+    
+    def append(self, timestamp, status, dispatched):
+        index = (self.start + self.count) % self.capacity
+        self.timestamps[index] = timestamp
+        self.statuses[index] = status
+        self.dispatched[index] = dispatched
+        
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+    
+    def last(self):
+        """Return the newest sample, or None when empty"""
+        if not self.count:
+            return None
+        index = (self.start + self.count - 1) % self.capacity
+        return self.timestamps[index], self.statuses[index], self.dispatched[index]
+    
+    def samples(self, since=None):
+        """Yield samples oldest first, optionally only those at or after ``since``"""
+        for offset in range(self.count):
+            index = (self.start + offset) % self.capacity
+            timestamp = self.timestamps[index]
+            if since is None or timestamp >= since:
+                yield timestamp, self.statuses[index], self.dispatched[index]
+
+
+class PrinterHealthMonitor:
+    """Thread-safe per-printer status history and derived health metrics"""
+    
+    def __init__(self, capacity=None, min_interval=None):
+        self.capacity = capacity or getattr(settings, 'PRINTER_HEALTH_SAMPLES', 720)
+        self.min_interval = (
+            min_interval if min_interval is not None
+            else getattr(settings, 'PRINTER_HEALTH_MIN_INTERVAL', 5)
+        )
+        self._buffers = {}
+        self._dispatched = {}
+        self._lock = threading.Lock()
+    
+    def reset(self):
+        with self._lock:
+            self._buffers.clear()
+            self._dispatched.clear()
+    
+    def printers(self):
+        with self._lock:
+            return sorted(self._buffers)
+    
+    def record(self, printer_name, status, timestamp=None):
+        """Store a status sample, skipping unchanged samples within min_interval"""
+        timestamp = time.time() if timestamp is None else timestamp
+        code = STATUS_CODES.get(status, STATUS_CODES['error'])
+        
+        with self._lock:
+            buffer = self._buffers.get(printer_name)
+            if buffer is None:
+                buffer = self._buffers[printer_name] = StatusRingBuffer(self.capacity)
+            
+            last = buffer.last()
+            if last and last[1] == code and timestamp - last[0] < self.min_interval:
+                return
+            
+            buffer.append(timestamp, code, self._dispatched.get(printer_name, 0))
+    
+    def record_dispatch(self, printer_name, jobs=1):
+        """Count jobs sent to a printer; picked up by the next status sample"""
+        with self._lock:
+            self._dispatched[printer_name] = self._dispatched.get(printer_name, 0) + jobs
+    
+    def summary(self, printer_name, window=None, now=None):
+        """Compute health metrics over the last ``window`` seconds (default: all)"""
+        now = time.time() if now is None else now
+        since = None if window is None else now - window
+        
+        with self._lock:
+            buffer = self._buffers.get(printer_name)
+            samples = list(buffer.samples(since)) if buffer else []
+            dispatched_total = self._dispatched.get(printer_name, 0)
+        
+        result = {
+            'name': printer_name,
+            'samples': len(samples),
+            'status': None,
+            'uptime': None,
+            'error_rate': None,
+            'error_events_per_hour': None,
+            'jobs_per_hour': None,
+        }
+        if not samples:
+            return result
+        
+        first_time, _, first_dispatched = samples[0]
+        last_time, last_status, _ = samples[-1]
+        span = max(now, last_time) - first_time
+        
+        # Weight each sample by how long it stayed current
+        online_time = unhealthy_time = 0.0
+        error_events = 0
+        previous = None
+        for position, (timestamp, status, _) in enumerate(samples):
+            following = samples[position + 1][0] if position + 1 < len(samples) else max(now, timestamp)
+            duration = following - timestamp
+            if status == STATUS_CODES['online']:
+                online_time += duration
+            if status in UNHEALTHY_CODES:
+                unhealthy_time += duration
+                if previous is not None and previous not in UNHEALTHY_CODES:
+                    error_events += 1
+            previous = status
+        
+        hours = span / 3600
+        result.update({
+            'status': STATUS_NAMES[last_status],
+            'uptime': online_time / span if span else float(last_status == STATUS_CODES['online']),
+            'error_rate': unhealthy_time / span if span else float(last_status in UNHEALTHY_CODES),
+            'error_events_per_hour': error_events / hours if hours else 0.0,
+            'jobs_per_hour': (dispatched_total - first_dispatched) / hours if hours else 0.0,
+        })
+        return result
+    
+    def is_flapping(self, printer_name, now=None):
+        """True when the printer keeps dropping into error and cannot be trusted now
+        
+        Requires repeated drops into an offline or error state (at least
+        PRINTER_HEALTH_MAX_ERROR_EVENTS per hour) and, on top of that, either
+        a latest sample that is still unhealthy or a time-weighted error rate
+        of at least PRINTER_HEALTH_MAX_ERROR_RATE. A printer that is simply
+        down, or that recovered from a single fault, is not flapping.
+        """
+        window = getattr(settings, 'PRINTER_HEALTH_WINDOW', 300)
+        max_error_rate = getattr(settings, 'PRINTER_HEALTH_MAX_ERROR_RATE', 0.5)
+        max_error_events = getattr(settings, 'PRINTER_HEALTH_MAX_ERROR_EVENTS', 24)
+        min_samples = getattr(settings, 'PRINTER_HEALTH_MIN_SAMPLES', 3)
+        
+        summary = self.summary(printer_name, window=window, now=now)
+        if summary['samples'] < min_samples or summary['error_events_per_hour'] < max_error_events:
+            return False
+        return (
+            STATUS_CODES[summary['status']] in UNHEALTHY_CODES
+            or summary['error_rate'] >= max_error_rate
+        )
+
+
+health_monitor = PrinterHealthMonitor()
@@ -0,0 +1,67 @@
+"""
+Run this process as a print node that pulls jobs from the shared queue
+"""
+
+import logging
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+
+from printer import coordination
+from printer.printer_utils import PrinterManager
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Register as a print node and print jobs claimed from the shared queue'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--name', default=socket.gethostname(),
+                            help='Unique node name (default: host name)')
+        parser.add_argument('--printer', action='append', dest='printers',
+                            help='Printer this node serves; repeat for several '
+                                 f'(default: {PrinterManager.PRINTER_NAME})')
+        parser.add_argument('--batch', type=int, default=1,
+                            help='Jobs to claim per cycle')
+        parser.add_argument('--interval', type=float,
+                            default=getattr(settings, 'PRINTER_NODE_HEARTBEAT', 10),
+                            help='Seconds to wait between cycles when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Run until the queue has no jobs for this node, then exit')
+    
+    def handle(self, *args, **options):
+        printers = options['printers'] or [PrinterManager.PRINTER_NAME]
+        node = coordination.register_node(options['name'], printers)
+        self.stdout.write(f"Print node {node.name} serving: {', '.join(printers)}")
+        
+        # Retry database errors (lost connection, locked SQLite file) with
+        # exponential backoff, capped so leases are renewed before they expire
+        max_backoff = max(options['interval'], coordination.lease_duration().total_seconds() / 2)
+        backoff = options['interval']
+        
+        try:
+            while True:
+                # Drop connections the database closed or broke since the last cycle
+                close_old_connections()
+                try:
+                    processed = coordination.run_once(node, options['batch'])
+                except DatabaseError:
+                    logger.exception("Print node %s cycle failed; retrying in %ss", node.name, backoff)
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, max_backoff)
+                    continue
+                backoff = options['interval']
+                
+                if processed:
+                    self.stdout.write(f"Processed {processed} job(s)")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,88 @@
+"""
+Middleware for the printer app
+"""
+
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse
+from django.utils.http import http_date
+
+
+# ManifestStaticFilesStorage inserts a 12 character md5 prefix before the extension
+FINGERPRINT_RE = re.compile(r'\.[0-9a-f]{12}\.[^/]+$')
+
+# Content-Encoding tokens in order of preference, with their file suffix
+PRECOMPRESSED_ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+class StaticAssetMiddleware:
+    """Serve collected static files with precompressed variants and caching
+    
+    Files are read from STATIC_ROOT. Fingerprinted names are cached as
+    immutable for a year; anything else must be revalidated, which
+    ConditionalGetMiddleware answers from the Last-Modified header.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.static_url = settings.STATIC_URL
+        self.static_root = settings.STATIC_ROOT
+    
+    def __call__(self, request):
+        if (self.static_root and self.static_url
+                and request.method in ('GET', 'HEAD')
+                and request.path.startswith(self.static_url)):
+            response = self.serve(request, request.path[len(self.static_url):])
+            if response is not None:
+                return response
+        
+        return self.get_response(request)
+    
+    def serve(self, request, name):
+        root = os.path.realpath(self.static_root)
+        path = os.path.realpath(os.path.join(root, name))
+        if not path.startswith(root + os.sep) or not os.path.isfile(path):
+            return None
+        
+        content_type, _ = mimetypes.guess_type(path)
+        accepted = self.accepted_encodings(request)
+        
+        encoding = None
+        for token, suffix in PRECOMPRESSED_ENCODINGS:
+            if token in accepted and os.path.isfile(path + suffix):
+                encoding = token
+                path += suffix
+                break
+        
+        stat = os.stat(path)
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type=content_type or 'application/octet-stream',
+        )
+        response['Content-Length'] = stat.st_size
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Vary'] = 'Accept-Encoding'
+        if encoding:
+            response['Content-Encoding'] = encoding
+        
+        if FINGERPRINT_RE.search(name):
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = 'public, max-age=0, must-revalidate'
+        
+        return response
+    
+    @staticmethod
+    def accepted_encodings(request):
+        header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        accepted = set()
+        for part in header.split(','):
+            token, _, params = part.strip().partition(';')
+            if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+                continue
+            if token:
+                accepted.add(token.strip().lower())
+        return accepted
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('printer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='printhistory',
+            name='job_id',
+            field=models.IntegerField(blank=True, help_text='Spooler job id', null=True),
+        ),
+        migrations.AlterField(
+            model_name='printhistory',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('printing', 'Printing'), ('paused', 'Paused'), ('completed', 'Completed'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('printer', '0002_printhistory_job_control'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='printhistory',
+            index=models.Index(fields=['timestamp'], name='printhistory_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='printhistory',
+            index=models.Index(fields=['status', 'timestamp'], name='printhistory_status_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='printhistory',
+            index=models.Index(fields=['filename'], name='printhistory_filename_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='printhistory',
+            index=models.Index(fields=['ip_address'], name='printhistory_ip_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='printhistory',
+            index=models.Index(fields=['printer_name'], name='printhistory_printer_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('printer', '0003_printhistory_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrintNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('printers', models.JSONField(default=list, help_text='Printer names this node can print to')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_heartbeat', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PrintJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('printer_name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('claimed', 'Claimed'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('history', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='printer.printhistory')),
+                ('node', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='printer.printnode')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'printer_name', 'created_at'], name='printjob_claim_idx'), models.Index(fields=['status', 'lease_expires_at'], name='printjob_lease_idx')],
+            },
+        ),
+    ]
@@ -1,6 +1,11 @@
+import os
+
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from .printer_utils import PrinterManager
+
 
 class PrintHistory(models.Model):
     """Model to store print job history"""
@@ -8,8 +13,10 @@ class PrintHistory(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('printing', 'Printing'),
+        ('paused', 'Paused'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
     ]
     
     timestamp = models.DateTimeField(default=timezone.now)
@@ -21,12 +28,135 @@ class PrintHistory(models.Model):
     copies = models.IntegerField(default=1)
     error_message = models.TextField(blank=True, null=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
+    job_id = models.IntegerField(help_text='Spooler job id', null=True, blank=True)
     
     class Meta:
         ordering = ['-timestamp']
         verbose_name = 'Print History'
         verbose_name_plural = 'Print Histories'
+        indexes = [
+            # Backs ordering and the admin date hierarchy
+            models.Index(fields=['timestamp'], name='printhistory_timestamp_idx'),
+            models.Index(fields=['status', 'timestamp'], name='printhistory_status_ts_idx'),
+            # Prefix (LIKE 'abc%') searches; pattern ops are used on PostgreSQL only
+            models.Index(fields=['filename'], name='printhistory_filename_idx',
+                         opclasses=['varchar_pattern_ops']),
+            # Exact IP lookups only: PostgreSQL compiles startswith on inet as
+            # HOST(ip_address)::text LIKE, which this index cannot serve
+            models.Index(fields=['ip_address'], name='printhistory_ip_idx'),
+            models.Index(fields=['printer_name'], name='printhistory_printer_idx'),
+        ]
     
     def __str__(self):
         return f"{self.filename} - {self.timestamp} - {self.status}"
+    
+    def stored_file_path(self):
+        """Return the local path of the stored upload, or None if it is gone"""
+        if not self.file_path:
+            return None
+        try:
+            path = self.file_path.path
+        except NotImplementedError:
+            return None
+        return path if os.path.exists(path) else None
+    
+    def reprint(self, copies=None, ip_address=None):
+        """Send the stored file to the printer again without re-uploading
+        
+        Creates a new history record for the reprint and returns
+        (record, success, message), the latter two as from dispatch().
+        Raises FileNotFoundError if the stored file has been removed.
+        """
+        path = self.stored_file_path()
+        if path is None:
+            raise FileNotFoundError(f"Stored file for {self.filename} is no longer available")
+        
+        record = PrintHistory.objects.create(
+            filename=self.filename,
+            file_path=self.file_path.name,
+            file_size=self.file_size,
+            status='pending',
+            printer_name=self.printer_name,
+            copies=copies or self.copies,
+            ip_address=ip_address,
+        )
+        success, message = record.dispatch()
+        return record, success, message
+    
+    def dispatch(self, printer_name=None):
+        """Send this job to the printer, or to the shared job queue
+        
+        With PRINTER_SHARED_QUEUE enabled the record stays pending until a
+        print node claims it (see printer.coordination.enqueue); otherwise
+        the file is printed here and the outcome recorded. ``printer_name``
+        overrides the record's printer. Returns (success, message).
+        """
+        if getattr(settings, 'PRINTER_SHARED_QUEUE', False):
+            from .coordination import enqueue
+            return enqueue(self, printer_name)
+        
+        self.printer_name = printer_name or self.printer_name
+        success, message = PrinterManager.print_file(
+            os.path.join(settings.MEDIA_ROOT, self.file_path.name), self.copies,
+            printer_name=self.printer_name
+        )
+        
+        self.status = 'completed' if success else 'failed'
+        self.error_message = None if success else message
+        self.job_id = self.find_spooled_job(self.printer_name) if success else None
+        self.save(update_fields=['printer_name', 'status', 'error_message', 'job_id'])
+        return success, message
+    
+    def find_spooled_job(self, printer_name=None):
+        """Spooler job id of this record's stored file, if it is queued yet
+        
+        ShellExecute returns before the printing application spools the
+        file, so this can be None; queue actions then match the job on its
+        document title instead (see views.sync_history_with_queue).
+        """
+        return PrinterManager.find_job(os.path.basename(self.file_path.name), printer_name)
+
+
+class PrintNode(models.Model):
+    """A print server process attached to one or more local printers"""
+    
+    name = models.CharField(max_length=255, unique=True)
+    printers = models.JSONField(default=list, help_text='Printer names this node can print to')
+    started_at = models.DateTimeField(default=timezone.now)
+    last_heartbeat = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
 
+class PrintJob(models.Model):
+    """A print job in the queue shared by all print nodes"""
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('claimed', 'Claimed'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    history = models.ForeignKey(PrintHistory, on_delete=models.CASCADE, related_name='jobs')
+    printer_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    node = models.ForeignKey(PrintNode, on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='jobs')
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'printer_name', 'created_at'], name='printjob_claim_idx'),
+            models.Index(fields=['status', 'lease_expires_at'], name='printjob_lease_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.history.filename} - {self.printer_name} - {self.status}"
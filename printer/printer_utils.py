@@ -8,65 +8,180 @@ This module handles all printer-related operations including:
 - PowerShell integration for advanced printer control
 """
 
+import ntpath
 import os
 import sys
 import subprocess
 import tempfile
+import time
 from pathlib import Path
 
-# Windows-specific imports (will be available on Windows only)
-try:
-    import win32print
-    import win32api
-    WINDOWS_AVAILABLE = True
-except ImportError:
-    WINDOWS_AVAILABLE = False
-    # Mock functions for development on non-Windows systems
-    class MockWin32Print:
-        PRINTER_STATUS_READY = 0
-        PRINTER_STATUS_PAUSED = 1
-        PRINTER_STATUS_ERROR = 2
-        PRINTER_STATUS_OFFLINE = 512
-        
-        @staticmethod
-        def EnumPrinters(flags, name, level):
-            return [
-                (0, 0, 'HP LaserJet Pro 4004d', '', '', '')
-            ]
-        
-        @staticmethod
-        def GetDefaultPrinter():
-            return 'HP LaserJet Pro 4004d'
-        
-        @staticmethod
-        def OpenPrinter(printer_name):
-            return 1
-        
-        @staticmethod
-        def GetPrinter(handle, level):
-            return {
-                'Status': 0,
-                'cJobs': 0,
-                'pPrinterName': 'HP LaserJet Pro 4004d',
-            }
-        
-        @staticmethod
-        def ClosePrinter(handle):
-            pass
+from .health import health_monitor
+
+# Printer backend, chosen once per process by load_backend() from
+# PrinterConfig.ready() so importing this module never probes pywin32
+win32print = None
+win32api = None
+WINDOWS_AVAILABLE = False
+
+
+# Mock functions for development on non-Windows systems
+class MockWin32Print:
+    PRINTER_STATUS_READY = 0
+    PRINTER_STATUS_PAUSED = 1
+    PRINTER_STATUS_ERROR = 2
+    PRINTER_STATUS_OFFLINE = 512
+    PRINTER_ENUM_LOCAL = 2
+    PRINTER_ENUM_CONNECTIONS = 4
+    PRINTER_CONTROL_PURGE = 3
+    JOB_CONTROL_PAUSE = 1
+    JOB_CONTROL_RESUME = 2
+    JOB_CONTROL_CANCEL = 3
+    JOB_STATUS_PAUSED = 1
+    PRINTER_ACCESS_ADMINISTER = 0x4
+    PRINTER_ACCESS_USE = 0x8
+    PRINTER_ALL_ACCESS = 0xF000C
+    
+    # How long a job submitted through MockWin32Api takes to "print"
+    PRINT_SECONDS = 30
+    
+    def __init__(self):
+        # Mutable spooler queue so job control can be exercised off Windows
+        self.jobs = []
+        self._next_job_id = 1
+        self._finish_at = {}
+        # Access rights granted to each open handle
+        self._handles = {}
+    
+    def add_job(self, document, pages=1, print_seconds=None):
+        """Submit a job to the mock queue and return its id
         
-        @staticmethod
-        def EnumJobs(handle, first, count, level):
-            return []
+        Jobs stay queued until cancelled unless ``print_seconds`` is given,
+        in which case they leave the queue once that long has passed.
+        """
+        job_id = self._next_job_id
+        self._next_job_id += 1
+        self.jobs.append({
+            'JobId': job_id,
+            'pDocument': document,
+            'Status': 0,
+            'TotalPages': pages,
+            'Submitted': None,
+        })
+        if print_seconds is not None:
+            self._finish_at[job_id] = time.monotonic() + print_seconds
+        return job_id
+    
+    def _expire_jobs(self):
+        now = time.monotonic()
+        self.jobs[:] = [
+            job for job in self.jobs
+            if job['Status'] & self.JOB_STATUS_PAUSED
+            or self._finish_at.get(job['JobId'], now + 1) > now
+        ]
     
-    win32print = MockWin32Print()
+    def _find_job(self, job_id):
+        self._expire_jobs()
+        for job in self.jobs:
+            if job['JobId'] == job_id:
+                return job
+        raise RuntimeError(f"The parameter is incorrect: job {job_id}")
     
-    class MockWin32Api:
-        @staticmethod
-        def ShellExecute(hwnd, operation, file, params, directory, show_cmd):
-            print(f"Mock ShellExecute: {operation} {file}")
-            return 42
+    def _require_administer(self, handle):
+        if not self._handles.get(handle, 0) & self.PRINTER_ACCESS_ADMINISTER:
+            raise RuntimeError("Access is denied")
     
-    win32api = MockWin32Api()
+    @staticmethod
+    def EnumPrinters(flags, name=None, level=1):
+        return [
+            (0, 0, 'HP LaserJet Pro 4004d', '', '', '')
+        ]
+    
+    @staticmethod
+    def GetDefaultPrinter():
+        return 'HP LaserJet Pro 4004d'
+    
+    def OpenPrinter(self, printer_name, defaults=None):
+        handle = max(self._handles, default=0) + 1
+        self._handles[handle] = (defaults or {}).get('DesiredAccess', self.PRINTER_ACCESS_USE)
+        return handle
+    
+    def GetPrinter(self, handle, level):
+        self._expire_jobs()
+        return {
+            'Status': 0,
+            'cJobs': len(self.jobs),
+            'pPrinterName': 'HP LaserJet Pro 4004d',
+        }
+    
+    def ClosePrinter(self, handle):
+        self._handles.pop(handle, None)
+    
+    def EnumJobs(self, handle, first, count, level):
+        self._expire_jobs()
+        jobs = self.jobs[first:] if count < 0 else self.jobs[first:first + count]
+        return [
+            dict(job, Position=first + index + 1)
+            for index, job in enumerate(jobs)
+        ]
+    
+    def GetJob(self, handle, job_id, level):
+        job = self._find_job(job_id)
+        return dict(job, Position=self.jobs.index(job) + 1)
+    
+    def SetJob(self, handle, job_id, level, job_info, command):
+        job = self._find_job(job_id)
+        if command == self.JOB_CONTROL_CANCEL:
+            self.jobs.remove(job)
+        elif command == self.JOB_CONTROL_PAUSE:
+            job['Status'] |= self.JOB_STATUS_PAUSED
+        elif command == self.JOB_CONTROL_RESUME:
+            job['Status'] &= ~self.JOB_STATUS_PAUSED
+        if level == 1 and job_info and 'Position' in job_info:
+            self._require_administer(handle)
+            self.jobs.remove(job)
+            position = min(max(job_info['Position'], 1), len(self.jobs) + 1)
+            self.jobs.insert(position - 1, job)
+    
+    def SetPrinter(self, handle, level, printer_info, command):
+        if command == self.PRINTER_CONTROL_PURGE:
+            self._require_administer(handle)
+            self.jobs.clear()
+
+
+class MockWin32Api:
+    def __init__(self, spooler):
+        self.spooler = spooler
+    
+    def ShellExecute(self, hwnd, operation, file, params, directory, show_cmd):
+        print(f"Mock ShellExecute: {operation} {file}")
+        if operation == 'print':
+            # Spool under the file name, as most printing applications do
+            self.spooler.add_job(os.path.basename(file), print_seconds=self.spooler.PRINT_SECONDS)
+        return 42
+
+
+def load_backend():
+    """Select and initialise the win32 or mock printer backend
+    
+    Safe to call more than once; only the first call does any work.
+    """
+    global win32print, win32api, WINDOWS_AVAILABLE
+    
+    if win32print is not None:
+        return
+    
+    try:
+        import win32print as _win32print
+        import win32api as _win32api
+    except ImportError:
+        win32print = MockWin32Print()
+        win32api = MockWin32Api(win32print)
+        WINDOWS_AVAILABLE = False
+    else:
+        win32print = _win32print
+        win32api = _win32api
+        WINDOWS_AVAILABLE = True
 
 
 class PrinterManager:
@@ -74,13 +189,28 @@ class PrinterManager:
     
     PRINTER_NAME = "HP LaserJet Pro 4004d"
     
+    # Job control actions mapped to their win32print SetJob command
+    JOB_ACTIONS = {
+        'cancel': 'JOB_CONTROL_CANCEL',
+        'pause': 'JOB_CONTROL_PAUSE',
+        'resume': 'JOB_CONTROL_RESUME',
+        'move_up': None,
+        'move_down': None,
+    }
+    
+    @staticmethod
+    def get_printer_status(printer_name=None):
+        """Get the current status of the printer and record it in the health history"""
+        status = PrinterManager._read_printer_status(printer_name or PrinterManager.PRINTER_NAME)
+        health_monitor.record(status['name'], status['status'])
+        return status
+    
     @staticmethod
-    def get_printer_status():
-        """Get the current status of the printer"""
+    def _read_printer_status(printer_name):
         try:
             if not WINDOWS_AVAILABLE:
                 return {
-                    'name': PrinterManager.PRINTER_NAME,
+                    'name': printer_name,
                     'status': 'online',
                     'status_code': 0,
                     'jobs_count': 0,
@@ -89,7 +219,7 @@ class PrinterManager:
                 }
             
             # Get printer handle
-            handle = win32print.OpenPrinter(PrinterManager.PRINTER_NAME)
+            handle = win32print.OpenPrinter(printer_name)
             printer_info = win32print.GetPrinter(handle, 2)
             
             # Parse status
@@ -112,16 +242,16 @@ class PrinterManager:
             win32print.ClosePrinter(handle)
             
             return {
-                'name': PrinterManager.PRINTER_NAME,
+                'name': printer_name,
                 'status': status,
                 'status_code': status_code,
                 'jobs_count': jobs_count,
-                'is_default': win32print.GetDefaultPrinter() == PrinterManager.PRINTER_NAME,
+                'is_default': win32print.GetDefaultPrinter() == printer_name,
                 'message': message,
             }
         except Exception as e:
             return {
-                'name': PrinterManager.PRINTER_NAME,
+                'name': printer_name,
                 'status': 'error',
                 'status_code': -1,
                 'jobs_count': 0,
@@ -133,9 +263,6 @@ class PrinterManager:
     def get_print_queue():
         """Get the current print queue"""
         try:
-            if not WINDOWS_AVAILABLE:
-                return []
-            
             handle = win32print.OpenPrinter(PrinterManager.PRINTER_NAME)
             jobs = win32print.EnumJobs(handle, 0, -1, 1)
             win32print.ClosePrinter(handle)
@@ -147,6 +274,7 @@ class PrinterManager:
                     'document': job.get('pDocument', 'Unknown'),
                     'status': job.get('Status', 0),
                     'pages': job.get('TotalPages', 0),
+                    'position': job.get('Position', 0),
                     'submitted': job.get('Submitted', None),
                 })
             
@@ -156,17 +284,159 @@ class PrinterManager:
             return []
     
     @staticmethod
-    def print_file(file_path, copies=1):
-        """Print a file to the printer"""
+    def document_file_names(document):
+        """File names a spooled document title may refer to
+        
+        Printing applications title their jobs with the file name, a full
+        path, or the name joined to the application name with " - " (e.g.
+        "report.txt - Notepad").
+        """
+        if not document:
+            return set()
+        parts = [document] + document.split(' - ')
+        return {ntpath.basename(part.strip()) for part in parts if part.strip()}
+    
+    @staticmethod
+    def find_job(file_name, printer_name=None):
+        """Return the id of the newest queued job printing ``file_name``, or None"""
+        try:
+            handle = win32print.OpenPrinter(printer_name or PrinterManager.PRINTER_NAME)
+            try:
+                jobs = win32print.EnumJobs(handle, 0, -1, 1)
+            finally:
+                win32print.ClosePrinter(handle)
+        except Exception:
+            return None
+        
+        for job in reversed(jobs):
+            if file_name in PrinterManager.document_file_names(job.get('pDocument')):
+                return job.get('JobId')
+        return None
+    
+    @staticmethod
+    def open_for_admin():
+        """Open PRINTER_NAME with the access rights purging and reordering need"""
+        return win32print.OpenPrinter(
+            PrinterManager.PRINTER_NAME, {'DesiredAccess': win32print.PRINTER_ALL_ACCESS}
+        )
+    
+    @staticmethod
+    def control_jobs(job_ids, action):
+        """Apply a job control action to several jobs in one spooler session
+        
+        ``action`` is one of JOB_ACTIONS. Returns one result dict per
+        requested job id with its document name, success flag and message.
+        """
+        if action not in PrinterManager.JOB_ACTIONS:
+            raise ValueError(f"Unknown job action: {action}")
+        
+        results = []
+        try:
+            if action in ('move_up', 'move_down'):
+                # Reordering the queue needs administer rights on the printer
+                handle = PrinterManager.open_for_admin()
+            else:
+                handle = win32print.OpenPrinter(PrinterManager.PRINTER_NAME)
+        except Exception as e:
+            return [
+                {'job_id': job_id, 'document': None, 'success': False,
+                 'message': f'Error opening printer: {str(e)}'}
+                for job_id in job_ids
+            ]
+        
+        try:
+            queued = {
+                job.get('JobId'): job
+                for job in win32print.EnumJobs(handle, 0, -1, 1)
+            }
+            
+            # Move jobs nearest the target end first so a selected block
+            # shifts together instead of jobs swapping places with each other
+            ordered = list(dict.fromkeys(job_ids))
+            step = -1 if action == 'move_up' else 1
+            last_position = max((job.get('Position', 0) for job in queued.values()), default=0)
+            # Positions of selected jobs that stayed put; jobs behind them must stay too
+            stuck = set()
+            if action in ('move_up', 'move_down'):
+                ordered.sort(
+                    key=lambda job_id: queued.get(job_id, {}).get('Position', 0),
+                    reverse=(action == 'move_down'),
+                )
+            
+            for job_id in ordered:
+                job = queued.get(job_id)
+                if job is None:
+                    results.append({'job_id': job_id, 'document': None, 'success': False,
+                                    'message': 'Job not found in queue'})
+                    continue
+                
+                try:
+                    if action in ('move_up', 'move_down'):
+                        position = job.get('Position', 0)
+                        target = position + step
+                        if target < 1 or target > last_position or target in stuck:
+                            stuck.add(position)
+                            results.append({'job_id': job_id, 'document': job.get('pDocument'),
+                                            'success': True, 'message': 'Already at the end of the queue'})
+                            continue
+                        
+                        job_info = win32print.GetJob(handle, job_id, 1)
+                        job_info['Position'] = target
+                        try:
+                            win32print.SetJob(handle, job_id, 1, job_info, 0)
+                        except Exception:
+                            stuck.add(position)
+                            raise
+                    else:
+                        command = getattr(win32print, PrinterManager.JOB_ACTIONS[action])
+                        win32print.SetJob(handle, job_id, 0, None, command)
+                    results.append({'job_id': job_id, 'document': job.get('pDocument'),
+                                    'success': True, 'message': 'OK'})
+                except Exception as e:
+                    results.append({'job_id': job_id, 'document': job.get('pDocument'),
+                                    'success': False, 'message': str(e)})
+        finally:
+            win32print.ClosePrinter(handle)
+        
+        return results
+    
+    @staticmethod
+    def purge_queue():
+        """Cancel every job in the print queue with a single spooler call
+        
+        Returns (success, message, jobs) where jobs are the queue entries
+        that were removed.
+        """
+        try:
+            handle = PrinterManager.open_for_admin()
+            try:
+                jobs = [
+                    {'job_id': job.get('JobId'), 'document': job.get('pDocument'),
+                     'success': True, 'message': 'OK'}
+                    for job in win32print.EnumJobs(handle, 0, -1, 1)
+                ]
+                win32print.SetPrinter(handle, 0, None, win32print.PRINTER_CONTROL_PURGE)
+            finally:
+                win32print.ClosePrinter(handle)
+            
+            return True, f"Purged {len(jobs)} job(s) from the queue", jobs
+        except Exception as e:
+            return False, f"Error purging print queue: {str(e)}", []
+    
+    @staticmethod
+    def print_file(file_path, copies=1, printer_name=None):
+        """Print a file to the printer (PRINTER_NAME unless another is given)"""
+        printer_name = printer_name or PrinterManager.PRINTER_NAME
         try:
             file_path = Path(file_path)
             
             if not file_path.exists():
                 raise FileNotFoundError(f"File not found: {file_path}")
             
-            if not WINDOWS_AVAILABLE:
-                print(f"Mock print: {file_path} with {copies} copies")
-                return True, "File sent to printer (Mock mode)"
+            if health_monitor.is_flapping(printer_name):
+                return False, "Printer has been going offline or into error repeatedly; job not sent"
+            
+            health_monitor.record_dispatch(printer_name)
             
             # Use ShellExecute to print the file
             # This will use the default application associated with the file type
@@ -174,11 +444,13 @@ class PrinterManager:
                 0,
                 "print",
                 str(file_path),
-                f'/d:"{PrinterManager.PRINTER_NAME}"',
+                f'/d:"{printer_name}"',
                 ".",
                 0
             )
             
+            if not WINDOWS_AVAILABLE:
+                return True, "File sent to printer (Mock mode)"
             return True, f"File sent to printer: {file_path.name}"
         except Exception as e:
             return False, f"Error printing file: {str(e)}"
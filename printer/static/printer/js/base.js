@@ -0,0 +1,24 @@
+// Update printer status in header
+function updatePrinterStatus() {
+    fetch('/api/printer-status/')
+        .then(response => response.json())
+        .then(data => {
+            const statusEl = document.getElementById('printer-status-header');
+            let statusClass = 'status-offline';
+
+            if (data.status === 'online') {
+                statusClass = 'status-online';
+            } else if (data.status === 'error') {
+                statusClass = 'status-error';
+            }
+
+            statusEl.innerHTML = `<span class="status-indicator ${statusClass}">${data.message}</span>`;
+        })
+        .catch(error => {
+            console.error('Error fetching printer status:', error);
+        });
+}
+
+// Update status on page load and every 5 seconds
+updatePrinterStatus();
+setInterval(updatePrinterStatus, 5000);
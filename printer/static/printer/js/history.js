@@ -0,0 +1,31 @@
+// Reprint a stored file from history without uploading it again
+function reprint(id, copies) {
+    const input = prompt('Number of copies (1-10):', copies);
+    if (input === null) return;
+
+    const messageDiv = document.getElementById('reprint-message');
+
+    fetch(`/api/history/${id}/reprint/`, {
+        method: 'POST',
+        body: JSON.stringify({copies: parseInt(input, 10)}),
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+        }
+    })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                messageDiv.innerHTML = `<div class="message message-success">✓ ${data.message}</div>`;
+                setTimeout(() => location.reload(), 2000);
+            } else if (data.reupload) {
+                messageDiv.innerHTML = `<div class="message message-error">✗ ${data.message} <a href="/">Upload</a></div>`;
+            } else {
+                messageDiv.innerHTML = `<div class="message message-error">✗ ${data.message}</div>`;
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            messageDiv.innerHTML = '<div class="message message-error">✗ Error sending reprint</div>';
+        });
+}
@@ -0,0 +1,153 @@
+// Handle form submission via AJAX
+document.getElementById('upload-form').addEventListener('submit', function(e) {
+    e.preventDefault();
+
+    const formData = new FormData(this);
+    const messageDiv = document.getElementById('upload-message');
+    const button = document.getElementById('print-button');
+
+    button.disabled = true;
+    button.textContent = '⏳ Uploading...';
+    messageDiv.innerHTML = '';
+
+    fetch(this.action, {
+        method: 'POST',
+        body: formData,
+        headers: {
+            'X-Requested-With': 'XMLHttpRequest'
+        }
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            messageDiv.innerHTML = `<div class="message message-success">✓ ${data.message}</div>`;
+            document.getElementById('upload-form').reset();
+            // Refresh page after 2 seconds to update history
+            setTimeout(() => location.reload(), 2000);
+        } else {
+            messageDiv.innerHTML = `<div class="message message-error">✗ ${data.message}</div>`;
+        }
+    })
+    .catch(error => {
+        messageDiv.innerHTML = `<div class="message message-error">✗ Error uploading file</div>`;
+        console.error('Error:', error);
+    })
+    .finally(() => {
+        button.disabled = false;
+        button.textContent = '🖨️ Upload & Print';
+    });
+});
+
+// Update printer info
+function updatePrinterInfo() {
+    fetch('/api/printer-status/')
+        .then(response => response.json())
+        .then(data => {
+            const infoDiv = document.getElementById('printer-info');
+            infoDiv.innerHTML = `
+                <div class="info-label">Printer Name:</div>
+                <div class="info-value">${data.name}</div>
+
+                <div class="info-label">Status:</div>
+                <div class="info-value">${data.message}</div>
+
+                <div class="info-label">Jobs in Queue:</div>
+                <div class="info-value">${data.jobs_count}</div>
+
+                <div class="info-label">Default Printer:</div>
+                <div class="info-value">${data.is_default ? 'Yes' : 'No'}</div>
+            `;
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            document.getElementById('printer-info').innerHTML = 
+                '<div class="message message-error">Error loading printer info</div>';
+        });
+}
+
+// Refresh print queue
+function refreshQueue() {
+    const queueDiv = document.getElementById('print-queue');
+    queueDiv.innerHTML = '<div class="loading">Loading queue...</div>';
+
+    fetch('/api/print-queue/')
+        .then(response => response.json())
+        .then(data => {
+            if (data.queue.length === 0) {
+                queueDiv.innerHTML = '<div class="message message-info">Queue is empty</div>';
+            } else {
+                let html = '<h3>Print Queue</h3><table><thead><tr><th>Job ID</th><th>Document</th><th>Pages</th><th>Actions</th></tr></thead><tbody>';
+                data.queue.forEach(job => {
+                    html += `<tr><td>${job.job_id}</td><td>${job.document}</td><td>${job.pages}</td><td>
+                        <button onclick="queueAction('move_up', [${job.job_id}])" class="btn-secondary" title="Move up">⬆</button>
+                        <button onclick="queueAction('move_down', [${job.job_id}])" class="btn-secondary" title="Move down">⬇</button>
+                        <button onclick="queueAction('pause', [${job.job_id}])" class="btn-secondary" title="Pause">⏸</button>
+                        <button onclick="queueAction('resume', [${job.job_id}])" class="btn-secondary" title="Resume">▶</button>
+                        <button onclick="queueAction('cancel', [${job.job_id}])" title="Cancel">✖</button>
+                    </td></tr>`;
+                });
+                html += '</tbody></table>';
+                html += '<button onclick="purgeQueue()" style="margin-top: 10px;">🗑️ Cancel All Jobs</button>';
+                queueDiv.innerHTML = html;
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            queueDiv.innerHTML = '<div class="message message-error">Error loading queue</div>';
+        });
+}
+
+// Apply a job control action to the given job ids
+function queueAction(action, jobIds) {
+    fetch(`/api/print-queue/${action}/`, {
+        method: 'POST',
+        body: JSON.stringify({job_ids: jobIds}),
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+        }
+    })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                alert(data.message);
+            }
+            refreshQueue();
+            updatePrinterInfo();
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('Error updating print queue');
+        });
+}
+
+// Cancel every job in the queue
+function purgeQueue() {
+    if (!confirm('Cancel all jobs in the print queue?')) return;
+    queueAction('purge', []);
+}
+
+// Print test page
+function printTestPage() {
+    if (!confirm('Send a test page to the printer?')) return;
+
+    fetch('/api/test-print/')
+        .then(response => response.json())
+        .then(data => {
+            const messageDiv = document.getElementById('upload-message');
+            if (data.success) {
+                messageDiv.innerHTML = `<div class="message message-success">✓ ${data.message}</div>`;
+                setTimeout(() => location.reload(), 2000);
+            } else {
+                messageDiv.innerHTML = `<div class="message message-error">✗ ${data.message}</div>`;
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('Error sending test page');
+        });
+}
+
+// Initialize
+updatePrinterInfo();
+setInterval(updatePrinterInfo, 10000);  // Update every 10 seconds
@@ -0,0 +1,62 @@
+"""
+Static file storage for the printer app
+
+Extends Django's manifest storage so that ``collectstatic`` writes
+fingerprinted file names plus precompressed gzip (and brotli, when the
+optional ``brotli`` package is installed) variants alongside them.
+"""
+
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.html', '.json', '.map')
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest static storage that also precompresses text assets"""
+    
+    manifest_strict = False
+    
+    def hashed_name(self, name, content=None, filename=None):
+        try:
+            return super().hashed_name(name, content, filename)
+        except ValueError:
+            if content is not None or filename is not None:
+                raise
+            # Not collected yet (e.g. under the test runner), serve it unversioned
+            return name
+    
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        
+        if dry_run:
+            return
+        
+        names = set(self.hashed_files) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(name):
+                self.compress(name)
+    
+    def compress(self, name):
+        """Write .gz/.br variants of a file when they are actually smaller"""
+        with self.open(name) as f:
+            data = f.read()
+        
+        variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(data)))
+        
+        for suffix, compressed in variants:
+            if len(compressed) >= len(data):
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self.save(name + suffix, ContentFile(compressed))
@@ -0,0 +1,86 @@
+"""
+Background batch jobs for the printer app
+
+Long-running bulk operations (admin actions over thousands of history rows)
+are handed to a single worker thread and processed in fixed-size batches so
+the request that triggered them returns immediately. Set
+PRINTER_TASKS_EAGER = True to run them inline, e.g. in tests.
+"""
+
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import PrintHistory
+
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='printer-tasks')
+
+
+def submit(func, *args, **kwargs):
+    """Run ``func`` on the background worker, or inline when eager"""
+    if getattr(settings, 'PRINTER_TASKS_EAGER', False):
+        future = Future()
+        future.set_result(func(*args, **kwargs))
+        return future
+    return _executor.submit(_run, func, *args, **kwargs)
+
+
+def _run(func, *args, **kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", func.__name__)
+        raise
+    finally:
+        close_old_connections()
+
+
+def batches(ids, size=None):
+    """Split a list of ids into chunks of PRINTER_TASK_BATCH_SIZE"""
+    size = size or getattr(settings, 'PRINTER_TASK_BATCH_SIZE', 500)
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def mark_failed(ids, message='Marked as failed by administrator'):
+    """Set status to failed for the given history records"""
+    updated = 0
+    for chunk in batches(ids):
+        updated += PrintHistory.objects.filter(pk__in=chunk).update(
+            status='failed', error_message=message
+        )
+    return updated
+
+
+def purge_files(ids):
+    """Delete stored upload files and clear file_path on the given records"""
+    purged = 0
+    for chunk in batches(ids):
+        records = PrintHistory.objects.filter(pk__in=chunk).exclude(file_path='').exclude(file_path=None)
+        with transaction.atomic():
+            for record in records:
+                record.file_path.delete(save=False)
+                record.file_path = None
+                record.save(update_fields=['file_path'])
+                purged += 1
+    return purged
+
+
+def reprint(ids):
+    """Send stored files of the given records to the printer again"""
+    sent = 0
+    for chunk in batches(ids):
+        for record in PrintHistory.objects.filter(pk__in=chunk):
+            try:
+                _, success, _ = record.reprint()
+            except FileNotFoundError:
+                continue
+            sent += success
+    return sent
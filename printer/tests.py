@@ -1,7 +1,40 @@
-from django.test import TestCase, Client
+from django.test import SimpleTestCase, TestCase, Client, override_settings
+from django.conf import settings
+from django.utils import timezone
 from django.core.files.uploadedfile import SimpleUploadedFile
-from .models import PrintHistory
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.contrib.auth.models import User
+from .models import PrintHistory, PrintJob, PrintNode
+from . import coordination, tasks
+from . import printer_utils
+from .admin import CachedCountPaginator
+from .health import PrinterHealthMonitor, StatusRingBuffer, health_monitor
+import gzip
+from io import StringIO
 import json
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import mock
+
+
+class TempMediaRootMixin:
+    """Point MEDIA_ROOT at a temporary directory for each test"""
+    
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
 
 
 class PrinterViewTests(TestCase):
@@ -91,6 +124,787 @@ class PrinterViewTests(TestCase):
         self.assertContains(response, 'Print History')
 
 
+class PrinterBackendTests(TestCase):
+    """Test cases for printer backend selection"""
+    
+    def test_backend_loaded_at_ready(self):
+        """Test that the backend is initialised once by PrinterConfig.ready"""
+        backend = printer_utils.win32print
+        self.assertIsNotNone(backend)
+        self.assertIsNotNone(printer_utils.win32api)
+        
+        printer_utils.load_backend()
+        self.assertIs(printer_utils.win32print, backend)
+
+
+class QueueManagementTests(TempMediaRootMixin, TestCase):
+    """Test cases for print queue job control"""
+    
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+        self.spooler = printer_utils.win32print
+        self.spooler.jobs.clear()
+        self.first = self.spooler.add_job('first.pdf', pages=300)
+        self.second = self.spooler.add_job('second.pdf')
+        self.third = self.spooler.add_job('third.pdf')
+    
+    def post_action(self, action, job_ids):
+        return self.client.post(
+            f'/api/print-queue/{action}/',
+            json.dumps({'job_ids': job_ids}),
+            content_type='application/json'
+        )
+    
+    def queued_ids(self):
+        data = json.loads(self.client.get('/api/print-queue/').content)
+        return [job['job_id'] for job in data['queue']]
+    
+    def test_cancel_jobs_in_bulk(self):
+        """Test cancelling several jobs at once updates queue and history"""
+        record = PrintHistory.objects.create(filename='first.pdf', status='printing')
+        response = self.post_action('cancel', [self.first, self.third])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(response.content)['success'])
+        self.assertEqual(self.queued_ids(), [self.second])
+        
+        record.refresh_from_db()
+        self.assertEqual(record.status, 'cancelled')
+        self.assertEqual(record.job_id, self.first)
+    
+    def upload(self, name, content=b'content'):
+        self.client.post(
+            '/upload/',
+            {'file': SimpleUploadedFile(name, content), 'copies': 1},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        return PrintHistory.objects.latest('timestamp')
+    
+    def test_cancel_uploaded_job(self):
+        """Test that cancelling an uploaded job updates its own history record"""
+        earlier = self.upload('same.txt')
+        record = self.upload('same.txt')
+        self.assertEqual(record.status, 'completed')
+        self.assertIsNotNone(record.job_id)
+        
+        self.post_action('cancel', [record.job_id])
+        record.refresh_from_db()
+        earlier.refresh_from_db()
+        self.assertEqual(record.status, 'cancelled')
+        self.assertEqual(earlier.status, 'completed')
+    
+    def test_late_spooled_job_matched_on_stored_name(self):
+        """Test matching a job spooled after upload under an application title"""
+        with mock.patch.object(printer_utils.PrinterManager, 'find_job', return_value=None):
+            self.upload('same.txt')
+            record = self.upload('same.txt')
+        self.assertIsNone(record.job_id)
+        
+        stored_name = os.path.basename(record.file_path.name)
+        job_id = self.spooler.add_job(f'{stored_name} - Notepad')
+        self.post_action('pause', [job_id])
+        
+        record.refresh_from_db()
+        self.assertEqual(record.job_id, job_id)
+        self.assertEqual(record.status, 'paused')
+        self.assertEqual(PrintHistory.objects.filter(status='paused').count(), 1)
+    
+    def test_finished_history_not_overwritten(self):
+        """Test that name matching never touches already finished prints"""
+        finished = PrintHistory.objects.create(filename='first.pdf', status='completed')
+        self.post_action('cancel', [self.first])
+        
+        finished.refresh_from_db()
+        self.assertEqual(finished.status, 'completed')
+        self.assertIsNone(finished.job_id)
+    
+    def test_pause_and_resume(self):
+        """Test pausing and resuming jobs"""
+        PrintHistory.objects.create(filename='second.pdf', job_id=self.second, status='printing')
+        self.post_action('pause', [self.second])
+        self.assertEqual(PrintHistory.objects.get(job_id=self.second).status, 'paused')
+        self.assertTrue(self.spooler.jobs[1]['Status'] & self.spooler.JOB_STATUS_PAUSED)
+        
+        self.post_action('resume', [self.second])
+        self.assertEqual(PrintHistory.objects.get(job_id=self.second).status, 'printing')
+        self.assertFalse(self.spooler.jobs[1]['Status'] & self.spooler.JOB_STATUS_PAUSED)
+    
+    def test_move_jobs(self):
+        """Test moving a block of jobs keeps their relative order"""
+        self.post_action('move_up', [self.second, self.third])
+        self.assertEqual(self.queued_ids(), [self.second, self.third, self.first])
+        
+        self.post_action('move_down', [self.second])
+        self.assertEqual(self.queued_ids(), [self.third, self.second, self.first])
+    
+    def test_move_block_at_top(self):
+        """Test that a selected block already at the top stays in place"""
+        self.post_action('move_up', [self.first, self.second])
+        self.assertEqual(self.queued_ids(), [self.first, self.second, self.third])
+        
+        self.post_action('move_up', [self.first, self.third])
+        self.assertEqual(self.queued_ids(), [self.first, self.third, self.second])
+    
+    def test_move_block_at_bottom(self):
+        """Test that a selected block already at the bottom stays in place"""
+        self.post_action('move_down', [self.second, self.third])
+        self.assertEqual(self.queued_ids(), [self.first, self.second, self.third])
+        
+        self.post_action('move_down', [self.first, self.third])
+        self.assertEqual(self.queued_ids(), [self.second, self.first, self.third])
+    
+    def test_unknown_job_reported(self):
+        """Test that missing jobs fail without affecting the others"""
+        response = self.post_action('cancel', [self.first, 999])
+        data = json.loads(response.content)
+        self.assertFalse(data['success'])
+        self.assertEqual([r['success'] for r in data['results']], [True, False])
+        self.assertEqual(self.queued_ids(), [self.second, self.third])
+    
+    def test_purge_queue(self):
+        """Test purging the whole queue"""
+        response = self.post_action('purge', [])
+        self.assertTrue(json.loads(response.content)['success'])
+        self.assertEqual(self.queued_ids(), [])
+    
+    def test_admin_actions_open_printer_with_full_access(self):
+        """Test that reordering and purging ask the spooler for administer rights"""
+        with mock.patch.object(printer_utils.PrinterManager, 'open_for_admin',
+                               lambda: self.spooler.OpenPrinter(printer_utils.PrinterManager.PRINTER_NAME)):
+            response = json.loads(self.post_action('move_down', [self.first]).content)
+            self.assertIn('Access is denied', response['results'][0]['message'])
+            response = json.loads(self.post_action('purge', []).content)
+            self.assertFalse(response['success'])
+        self.assertEqual(self.queued_ids(), [self.first, self.second, self.third])
+        
+        self.post_action('move_down', [self.first])
+        self.post_action('pause', [self.third])
+        self.assertEqual(self.queued_ids(), [self.second, self.first, self.third])
+        self.assertEqual(self.spooler._handles, {})
+    
+    def test_invalid_requests(self):
+        """Test validation of action names and job ids"""
+        self.assertEqual(self.post_action('explode', [self.first]).status_code, 400)
+        self.assertEqual(self.post_action('cancel', []).status_code, 400)
+        self.assertEqual(self.post_action('cancel', ['abc']).status_code, 400)
+        self.assertEqual(self.post_action('cancel', str(self.first) + '2').status_code, 400)
+        self.assertEqual(self.post_action('cancel', self.first).status_code, 400)
+        self.assertEqual(self.queued_ids(), [self.first, self.second, self.third])
+        self.assertEqual(self.client.get('/api/print-queue/cancel/').status_code, 405)
+
+
+class ResponseOptimisationTests(TestCase):
+    """Test cases for compression and caching of responses"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+    
+    def test_history_api_compact_and_gzipped(self):
+        """Test that history JSON is compact and gzip encoded on request"""
+        for i in range(20):
+            PrintHistory.objects.create(filename=f'doc{i}.pdf', status='completed')
+        
+        response = self.client.get('/api/history/')
+        self.assertNotIn(b'": ', response.content)
+        self.assertNotIn(b', "', response.content)
+        
+        response = self.client.get('/api/history/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(data['history']), 20)
+    
+    def test_json_conditional_get(self):
+        """Test that unchanged JSON responses revalidate with 304"""
+        response = self.client.get('/api/history/')
+        etag = response['ETag']
+        response = self.client.get('/api/history/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+    
+    def test_collected_static_is_fingerprinted_and_precompressed(self):
+        """Test collectstatic output is served compressed with immutable caching"""
+        with override_settings(STATIC_ROOT=self.static_root):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            
+            response = self.client.get('/')
+            css_url = re.search(r'href="(/static/printer/css/style\.[0-9a-f]{12}\.css)"',
+                                response.content.decode()).group(1)
+            self.assertTrue(os.path.exists(
+                os.path.join(self.static_root, css_url[len('/static/'):] + '.gz')))
+            
+            response = self.client.get(css_url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertIn(b'.container', gzip.decompress(b''.join(response.streaming_content)))
+            
+            response = self.client.get(css_url)
+            self.assertNotIn('Content-Encoding', response)
+            
+            response = self.client.get('/static/printer/css/style.css')
+            self.assertNotIn('immutable', response['Cache-Control'])
+            response = self.client.get(
+                '/static/printer/css/style.css',
+                HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            )
+            self.assertEqual(response.status_code, 304)
+    
+    def test_static_path_traversal_ignored(self):
+        """Test that paths outside STATIC_ROOT fall through to URL routing"""
+        with override_settings(STATIC_ROOT=self.static_root):
+            response = self.client.get('/static/../manage.py')
+            self.assertEqual(response.status_code, 404)
+
+
+class SpoolUploadTests(TempMediaRootMixin, TestCase):
+    """Test cases for streaming uploads straight into storage"""
+    
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+    
+    def upload(self, name, content, client=None):
+        return (client or self.client).post(
+            '/upload/',
+            {'file': SimpleUploadedFile(name, content), 'copies': 1},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+    
+    def stored_files(self):
+        upload_dir = os.path.join(self.media_root, 'print_files')
+        return sorted(os.listdir(upload_dir)) if os.path.isdir(upload_dir) else []
+    
+    def test_upload_written_once_to_final_location(self):
+        """Test that the upload lands at the path recorded in history"""
+        response = self.upload('report.txt', b'spooled content')
+        self.assertTrue(json.loads(response.content)['success'])
+        
+        record = PrintHistory.objects.get(filename='report.txt')
+        self.assertEqual(record.file_path.name, 'print_files/report.txt')
+        self.assertEqual(record.file_size, len(b'spooled content'))
+        with open(os.path.join(self.media_root, record.file_path.name), 'rb') as f:
+            self.assertEqual(f.read(), b'spooled content')
+    
+    def test_duplicate_names_are_not_overwritten(self):
+        """Test that repeated uploads of one name get distinct files"""
+        self.upload('same.txt', b'one')
+        self.upload('same.txt', b'two')
+        
+        names = [record.file_path.name for record in PrintHistory.objects.filter(filename='same.txt')]
+        self.assertEqual(len(set(names)), 2)
+        self.assertEqual(len(self.stored_files()), 2)
+    
+    def test_rejected_upload_is_removed(self):
+        """Test that files failing validation are not left in storage"""
+        response = self.upload('script.exe', b'MZ')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stored_files(), [])
+    
+    def test_repeated_file_field_cleaned_up(self):
+        """Test that every part of a repeated file field is removed unless kept"""
+        rejected = [SimpleUploadedFile(f'{name}.exe', b'MZ') for name in 'abc']
+        response = self.client.post('/upload/', {'file': rejected, 'copies': 1},
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stored_files(), [])
+        
+        accepted = [SimpleUploadedFile('first.txt', b'1'), SimpleUploadedFile('second.txt', b'2')]
+        response = self.client.post('/upload/', {'file': accepted, 'copies': 1},
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertTrue(json.loads(response.content)['success'])
+        record = PrintHistory.objects.get()
+        self.assertEqual(self.stored_files(), [os.path.basename(record.file_path.name)])
+    
+    def test_streamed_file_removed_on_error(self):
+        """Test that an exception in the view does not leave the upload behind"""
+        with mock.patch.object(PrintHistory.objects, 'create', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                self.upload('report.txt', b'data')
+        self.assertEqual(self.stored_files(), [])
+    
+    def test_csrf_still_enforced(self):
+        """Test that streaming uploads keep CSRF protection"""
+        response = self.upload('report.txt', b'data', client=Client(enforce_csrf_checks=True))
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(PrintHistory.objects.exists())
+
+
+class PrinterHealthTests(TestCase):
+    """Test cases for printer health history"""
+    
+    def setUp(self):
+        self.client = Client()
+        health_monitor.reset()
+        self.addCleanup(health_monitor.reset)
+    
+    def test_ring_buffer_wraps(self):
+        """Test that the ring buffer keeps only the newest samples in order"""
+        buffer = StatusRingBuffer(3)
+        for i in range(5):
+            buffer.append(float(i), 0, i)
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual([sample[0] for sample in buffer.samples()], [2.0, 3.0, 4.0])
+        self.assertEqual([sample[0] for sample in buffer.samples(since=3.0)], [3.0, 4.0])
+        self.assertEqual(buffer.last(), (4.0, 0, 4))
+    
+    def test_summary_metrics(self):
+        """Test uptime, error frequency and throughput calculations"""
+        monitor = PrinterHealthMonitor(capacity=10, min_interval=0)
+        monitor.record('P1', 'online', timestamp=0)
+        monitor.record_dispatch('P1', jobs=4)
+        monitor.record('P1', 'error', timestamp=1800)
+        monitor.record('P1', 'online', timestamp=2700)
+        
+        summary = monitor.summary('P1', now=3600)
+        self.assertEqual(summary['samples'], 3)
+        self.assertEqual(summary['status'], 'online')
+        self.assertAlmostEqual(summary['uptime'], 0.75)
+        self.assertAlmostEqual(summary['error_rate'], 0.25)
+        self.assertAlmostEqual(summary['error_events_per_hour'], 1.0)
+        self.assertAlmostEqual(summary['jobs_per_hour'], 4.0)
+    
+    def test_unchanged_samples_throttled(self):
+        """Test that repeated identical samples within min_interval are dropped"""
+        monitor = PrinterHealthMonitor(capacity=10, min_interval=5)
+        monitor.record('P1', 'online', timestamp=0)
+        monitor.record('P1', 'online', timestamp=2)
+        monitor.record('P1', 'offline', timestamp=3)
+        self.assertEqual(monitor.summary('P1', now=3)['samples'], 2)
+    
+    def test_flapping_printer_skipped_by_dispatch(self):
+        """Test that print_file refuses jobs for a printer with a high error rate"""
+        name = printer_utils.PrinterManager.PRINTER_NAME
+        now = time.time()
+        for offset, status in enumerate(['error', 'online', 'offline', 'error']):
+            health_monitor.record(name, status, timestamp=now - 40 + offset * 10)
+        self.assertTrue(health_monitor.is_flapping(name))
+        
+        with tempfile.NamedTemporaryFile(suffix='.txt') as f:
+            success, message = printer_utils.PrinterManager.print_file(f.name)
+        self.assertFalse(success)
+        self.assertIn('not sent', message)
+    
+    def test_flapping_rule(self):
+        """Test that flapping needs repeated faults plus a current or prolonged one"""
+        name = printer_utils.PrinterManager.PRINTER_NAME
+        
+        def flapping(*statuses):
+            health_monitor.reset()
+            now = time.time()
+            for offset, status in enumerate(statuses):
+                health_monitor.record(name, status, timestamp=now - 60 + offset * 10)
+            return health_monitor.is_flapping(name, now=now)
+        
+        # Simply down, or one fault it recovered from
+        self.assertFalse(flapping('error', 'error', 'offline', 'error'))
+        self.assertFalse(flapping('online', 'online', 'error', 'online', 'online'))
+        # Dropping in and out and unhealthy now
+        self.assertTrue(flapping('online', 'error', 'online', 'error'))
+        # Back online after repeated faults, but mostly unhealthy
+        self.assertTrue(flapping('online', 'error', 'error', 'online', 'offline', 'offline', 'online'))
+        # Back online after repeated short faults
+        self.assertFalse(flapping('online', 'online', 'error', 'online', 'online', 'offline', 'online'))
+    
+    def test_health_api(self):
+        """Test the printer health endpoint records and reports samples"""
+        self.client.get('/api/printer-status/')
+        response = self.client.get('/api/printer-health/')
+        self.assertEqual(response.status_code, 200)
+        printers = json.loads(response.content)['printers']
+        self.assertEqual(printers[0]['name'], 'HP LaserJet Pro 4004d')
+        self.assertEqual(printers[0]['samples'], 1)
+        self.assertFalse(printers[0]['flapping'])
+        
+        self.assertEqual(self.client.get('/api/printer-health/?window=abc').status_code, 400)
+
+
+@override_settings(PRINTER_TASKS_EAGER=True)
+class PrintHistoryAdminTests(TempMediaRootMixin, TestCase):
+    """Test cases for the PrintHistory admin on large tables"""
+    
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        
+        self.report = PrintHistory.objects.create(filename='report.pdf', status='completed',
+                                                  ip_address='10.0.0.5')
+        self.invoice = PrintHistory.objects.create(filename='invoice.pdf', status='completed',
+                                                   ip_address='192.168.1.9')
+    
+    def test_count_is_cached(self):
+        """Test that repeat counts of the same query hit the cache"""
+        self.assertEqual(CachedCountPaginator(PrintHistory.objects.all(), 10).count, 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(CachedCountPaginator(PrintHistory.objects.all(), 10).count, 2)
+        self.assertEqual(CachedCountPaginator(PrintHistory.objects.none(), 10).count, 0)
+    
+    def test_changelist_prefix_search(self):
+        """Test that search matches filename and IP prefixes only"""
+        url = '/admin/printer/printhistory/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        
+        response = self.client.get(url, {'q': 'rep'})
+        self.assertContains(response, 'report.pdf')
+        self.assertNotContains(response, 'invoice.pdf')
+        
+        response = self.client.get(url, {'q': '192.168'})
+        self.assertContains(response, 'invoice.pdf')
+        self.assertNotContains(response, 'report.pdf')
+        
+        response = self.client.get(url, {'q': 'port'})
+        self.assertNotContains(response, 'report.pdf')
+    
+    def run_action(self, action, records):
+        return self.client.post('/admin/printer/printhistory/', {
+            'action': action,
+            '_selected_action': [record.pk for record in records],
+        })
+    
+    def test_mark_failed_action(self):
+        """Test the mark failed bulk action"""
+        response = self.run_action('mark_failed_selected', [self.report, self.invoice])
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(PrintHistory.objects.filter(status='failed').count(), 2)
+    
+    def test_purge_and_reprint_actions(self):
+        """Test that purged files are removed and no longer reprinted"""
+        self.report.file_path.save('report.pdf', SimpleUploadedFile('report.pdf', b'%PDF'))
+        path = self.report.file_path.path
+        
+        self.run_action('reprint_selected', [self.report])
+        self.assertEqual(PrintHistory.objects.filter(filename='report.pdf').count(), 2)
+        
+        self.run_action('purge_files_selected', [self.report])
+        self.assertFalse(os.path.exists(path))
+        self.report.refresh_from_db()
+        self.assertFalse(self.report.file_path)
+
+
+class ReprintTests(TempMediaRootMixin, TestCase):
+    """Test cases for reprinting from history"""
+    
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+        
+        self.record = PrintHistory.objects.create(filename='notes.txt', status='completed', copies=1)
+        self.record.file_path.save('notes.txt', SimpleUploadedFile('notes.txt', b'notes'))
+    
+    def post_reprint(self, pk, body):
+        return self.client.post(f'/api/history/{pk}/reprint/', json.dumps(body),
+                                content_type='application/json')
+    
+    def test_reprint_reuses_stored_file(self):
+        """Test that reprint creates a new record for the same stored file"""
+        response = self.post_reprint(self.record.pk, {'copies': 3})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertTrue(data['success'])
+        
+        new_record = PrintHistory.objects.get(pk=data['id'])
+        self.assertEqual(new_record.copies, 3)
+        self.assertEqual(new_record.file_path.name, self.record.file_path.name)
+        self.assertEqual(new_record.status, 'completed')
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'print_files')), ['notes.txt'])
+    
+    def test_reprint_defaults_to_original_copies(self):
+        """Test that copies fall back to the original record"""
+        response = self.client.post(f'/api/history/{self.record.pk}/reprint/')
+        self.assertEqual(json.loads(response.content)['copies'], 1)
+    
+    def test_reprint_evicted_file(self):
+        """Test that a purged file asks the client to upload again"""
+        os.remove(self.record.file_path.path)
+        response = self.post_reprint(self.record.pk, {})
+        self.assertEqual(response.status_code, 410)
+        self.assertTrue(json.loads(response.content)['reupload'])
+        self.assertEqual(PrintHistory.objects.count(), 1)
+    
+    def test_reprint_validation(self):
+        """Test invalid reprint requests"""
+        self.assertEqual(self.post_reprint(self.record.pk, {'copies': 50}).status_code, 400)
+        self.assertEqual(self.post_reprint(self.record.pk, [1]).status_code, 400)
+        self.assertEqual(self.post_reprint(9999, {}).status_code, 404)
+        self.assertEqual(self.client.get(f'/api/history/{self.record.pk}/reprint/').status_code, 405)
+
+
+@override_settings(PRINTER_SHARED_QUEUE=True)
+class CoordinationTests(TempMediaRootMixin, TestCase):
+    """Test cases for the shared job queue across print nodes"""
+    
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+        
+        self.node_a = coordination.register_node('node-a', ['HP LaserJet Pro 4004d'])
+        self.node_b = coordination.register_node('node-b', ['HP LaserJet Pro 4004d'])
+    
+    def enqueue(self, count):
+        for i in range(count):
+            record = PrintHistory.objects.create(filename=f'doc{i}.txt', status='pending')
+            record.file_path.save(f'doc{i}.txt', SimpleUploadedFile(f'doc{i}.txt', b'data'))
+            record.dispatch()
+    
+    def expire_leases(self):
+        PrintJob.objects.filter(status='claimed').update(
+            lease_expires_at=timezone.now() - timezone.timedelta(seconds=1)
+        )
+    
+    def test_upload_enqueues_job(self):
+        """Test that uploads go to the shared queue instead of printing"""
+        self.client.post('/upload/', {
+            'file': SimpleUploadedFile('queued.txt', b'data'), 'copies': 2
+        })
+        job = PrintJob.objects.get()
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(job.history.status, 'pending')
+    
+    def stop_nodes(self):
+        PrintNode.objects.update(last_heartbeat=timezone.now() - timezone.timedelta(minutes=5))
+    
+    def test_upload_routed_to_live_printer(self):
+        """Test that uploads are rejected for printers no live node serves"""
+        response = self.client.post('/upload/', {
+            'file': SimpleUploadedFile('other.txt', b'data'), 'copies': 1, 'printer': 'Other Printer'
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        data = json.loads(response.content)
+        self.assertFalse(data['success'])
+        self.assertEqual(data['message'], 'No print node is serving Other Printer')
+        self.assertEqual(PrintHistory.objects.get().status, 'failed')
+        self.assertFalse(PrintJob.objects.exists())
+        
+        # Without an explicit printer the job falls back to a served one
+        record = PrintHistory.objects.create(filename='moved.txt', printer_name='Removed Printer')
+        self.assertEqual(record.dispatch(), (True, 'Job queued for printing'))
+        self.assertEqual(PrintJob.objects.get().printer_name, 'HP LaserJet Pro 4004d')
+        
+        self.stop_nodes()
+        record = PrintHistory.objects.create(filename='late.txt')
+        self.assertEqual(record.dispatch(), (False, 'No print node is online'))
+    
+    def test_orphaned_jobs_failed(self):
+        """Test that queued jobs fail once no live node serves their printer"""
+        self.enqueue(1)
+        self.assertEqual(coordination.fail_orphaned_jobs(), 0)
+        
+        self.stop_nodes()
+        self.assertEqual(coordination.fail_orphaned_jobs(), 1)
+        self.assertEqual(PrintJob.objects.get().status, 'failed')
+        history = PrintHistory.objects.get()
+        self.assertEqual(history.status, 'failed')
+        self.assertEqual(history.error_message, 'No print node is serving this printer')
+    
+    def test_nodes_claim_disjoint_jobs(self):
+        """Test that two nodes never claim the same job"""
+        self.enqueue(3)
+        claimed_a = coordination.claim_jobs(self.node_a, limit=2)
+        claimed_b = coordination.claim_jobs(self.node_b, limit=2)
+        self.assertEqual(len(claimed_a), 2)
+        self.assertEqual(len(claimed_b), 1)
+        self.assertFalse({job.pk for job in claimed_a} & {job.pk for job in claimed_b})
+        self.assertEqual(PrintHistory.objects.filter(status='printing').count(), 3)
+    
+    def test_nodes_only_claim_their_printers(self):
+        """Test that jobs are matched to nodes by printer name"""
+        self.enqueue(1)
+        other = coordination.register_node('node-c', ['Other Printer'])
+        self.assertEqual(coordination.claim_jobs(other), [])
+    
+    def test_reprint_queues_job(self):
+        """Test that reprints go through the shared queue and report success"""
+        self.enqueue(1)
+        coordination.run_once(self.node_a)
+        original = PrintHistory.objects.get()
+        
+        response = self.client.post(f'/api/history/{original.pk}/reprint/',
+                                    json.dumps({'copies': 2}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertTrue(data['success'])
+        self.assertEqual(data['message'], 'Job queued for printing')
+        self.assertEqual(data['status'], 'pending')
+        
+        job = PrintJob.objects.get(history_id=data['id'])
+        self.assertEqual(job.status, 'queued')
+        coordination.run_once(self.node_b)
+        self.assertEqual(PrintHistory.objects.get(pk=data['id']).status, 'completed')
+        
+        # The admin batch reprint counts queued jobs as sent
+        self.assertEqual(tasks.reprint([original.pk]), 1)
+    
+    def test_run_once_completes_jobs(self):
+        """Test a full cycle prints the job and updates history"""
+        self.enqueue(1)
+        self.assertEqual(coordination.run_once(self.node_a), 1)
+        job = PrintJob.objects.get()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.history.status, 'completed')
+    
+    def flap(self, printer_name='HP LaserJet Pro 4004d'):
+        now = time.time()
+        for offset, status in enumerate(['online', 'error', 'online', 'error', 'offline']):
+            health_monitor.record(printer_name, status, timestamp=now - 100 + offset * 20)
+    
+    def test_run_once_samples_printer_health(self):
+        """Test that nodes record health samples and leave jobs of flapping printers queued"""
+        health_monitor.reset()
+        self.addCleanup(health_monitor.reset)
+        
+        coordination.run_once(self.node_a)
+        self.assertEqual(health_monitor.summary('HP LaserJet Pro 4004d')['samples'], 1)
+        
+        health_monitor.reset()
+        self.flap()
+        self.enqueue(1)
+        self.assertEqual(coordination.run_once(self.node_a), 0)
+        job = PrintJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ('queued', 0))
+        self.assertEqual(job.history.status, 'pending')
+        
+        health_monitor.reset()
+        self.assertEqual(coordination.run_once(self.node_a), 1)
+        self.assertEqual(PrintHistory.objects.get().status, 'completed')
+    
+    def test_job_deferred_when_printer_starts_flapping(self):
+        """Test that a claimed job is requeued, not failed, if its printer starts flapping"""
+        health_monitor.reset()
+        self.addCleanup(health_monitor.reset)
+        self.enqueue(1)
+        [job] = coordination.claim_jobs(self.node_a)
+        
+        self.flap()
+        self.assertFalse(coordination.process_job(job, self.node_a))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.node, job.attempts), ('queued', None, 0))
+        self.assertEqual(job.history.status, 'pending')
+    
+    def test_expired_lease_reclaimed_by_other_node(self):
+        """Test that jobs of a node that stopped heartbeating are reclaimed"""
+        self.enqueue(1)
+        [job] = coordination.claim_jobs(self.node_a)
+        self.assertEqual(coordination.reclaim_expired_jobs(), 0)
+        
+        self.expire_leases()
+        self.assertEqual(coordination.reclaim_expired_jobs(), 1)
+        self.assertEqual(PrintHistory.objects.get().status, 'pending')
+        
+        [reclaimed] = coordination.claim_jobs(self.node_b)
+        self.assertEqual(reclaimed.pk, job.pk)
+        self.assertEqual(reclaimed.attempts, 2)
+        
+        # The original node's late result no longer counts
+        self.assertFalse(coordination.complete_job(job, self.node_a, True))
+        self.assertTrue(coordination.complete_job(reclaimed, self.node_b, True))
+    
+    def test_heartbeat_extends_leases(self):
+        """Test that heartbeats keep a node's leases alive"""
+        self.enqueue(1)
+        coordination.claim_jobs(self.node_a)
+        self.expire_leases()
+        self.assertEqual(coordination.heartbeat(self.node_a), 1)
+        self.assertEqual(coordination.reclaim_expired_jobs(), 0)
+    
+    def test_node_retries_database_errors(self):
+        """Test that the node loop logs database errors and backs off"""
+        outcomes = [DatabaseError('database is locked'), DatabaseError('database is locked'), 1, 0]
+        with mock.patch.object(coordination, 'run_once', side_effect=outcomes), \
+                mock.patch('printer.management.commands.run_print_node.close_old_connections') as close, \
+                mock.patch('time.sleep') as sleep, \
+                self.assertLogs('printer.management.commands.run_print_node', 'ERROR') as logs:
+            call_command('run_print_node', '--once', '--name', 'node-a', '--interval', '2', stdout=StringIO())
+        
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [2, 4])
+        self.assertEqual(close.call_count, 4)
+        self.assertIn('database is locked', logs.output[0])
+    
+    @override_settings(PRINTER_JOB_MAX_ATTEMPTS=1)
+    def test_job_fails_after_max_attempts(self):
+        """Test that repeatedly abandoned jobs are failed, not requeued"""
+        self.enqueue(1)
+        coordination.claim_jobs(self.node_a)
+        self.expire_leases()
+        coordination.reclaim_expired_jobs()
+        self.assertEqual(PrintJob.objects.get().status, 'failed')
+        self.assertEqual(PrintHistory.objects.get().status, 'failed')
+
+
+class MultiProcessCoordinationTests(SimpleTestCase):
+    """Run several print node processes against one SQLite file"""
+    
+    jobs = 30
+    nodes = 3
+    
+    def manage(self, *args):
+        return [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), *args]
+    
+    def wait_for(self, db, query, expected, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with sqlite3.connect(db) as connection:
+                if connection.execute(query).fetchone()[0] == expected:
+                    return
+            time.sleep(0.1)
+        self.fail(f'Timed out waiting for {query!r} to reach {expected}')
+    
+    def test_each_job_claimed_once(self):
+        """Test that concurrent nodes share the jobs and process each exactly once"""
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        db = os.path.join(tmp, 'db.sqlite3')
+        media = os.path.join(tmp, 'media')
+        env = dict(os.environ, PRINT_SERVER_DB=db, PRINT_SERVER_MEDIA=media,
+                   DJANGO_SETTINGS_MODULE='print_server.settings')
+        
+        subprocess.run(self.manage('migrate', '-v', '0'), env=env, check=True)
+        
+        # Start every node polling an empty queue before any job exists, so
+        # they all compete for the batch instead of the first one draining it
+        processes = []
+        for i in range(self.nodes):
+            process = subprocess.Popen(
+                self.manage('run_print_node', '--name', f'node-{i}', '--interval', '0.05'),
+                env=env, stdout=subprocess.DEVNULL
+            )
+            self.addCleanup(process.wait)
+            self.addCleanup(process.kill)
+            processes.append(process)
+        self.wait_for(db, 'SELECT COUNT(*) FROM printer_printnode', self.nodes)
+        
+        subprocess.run(self.manage('shell', '-c', (
+            'from django.core.files.base import ContentFile\n'
+            'from django.db import transaction\n'
+            'from django.test.utils import override_settings\n'
+            'from printer.models import PrintHistory\n'
+            'with override_settings(PRINTER_SHARED_QUEUE=True), transaction.atomic():\n'
+            f'    for i in range({self.jobs}):\n'
+            '        record = PrintHistory.objects.create(filename=f"doc{i}.txt")\n'
+            '        record.file_path.save(f"doc{i}.txt", ContentFile(b"data"))\n'
+            '        record.dispatch()\n'
+        )), env=env, check=True, stdout=subprocess.DEVNULL)
+        
+        self.wait_for(db, "SELECT COUNT(*) FROM printer_printhistory WHERE status = 'completed'", self.jobs)
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=10)
+        
+        with sqlite3.connect(db) as connection:
+            rows = connection.execute(
+                'SELECT job.status, job.attempts, job.node_id, history.status '
+                'FROM printer_printjob job JOIN printer_printhistory history '
+                'ON history.id = job.history_id'
+            ).fetchall()
+        self.assertEqual(len(rows), self.jobs)
+        # Every stored file went through print_file once and completed
+        self.assertEqual({row[0] for row in rows}, {'completed'})
+        self.assertEqual({row[3] for row in rows}, {'completed'})
+        self.assertTrue(all(attempts == 1 for _, attempts, _, _ in rows))
+        # More than one node took part, so the claims really were contended
+        self.assertGreater(len({node_id for _, _, node_id, _ in rows}), 1)
+
+
 class PrintHistoryModelTests(TestCase):
     """Test cases for PrintHistory model"""
     
@@ -0,0 +1,90 @@
+"""
+Upload handlers for the printer app
+
+SpoolFileUploadHandler streams uploaded files straight into their final
+location under MEDIA_ROOT/print_files, so each job is written to disk once
+instead of being buffered in memory or a temp file and then copied by
+default_storage.save().
+"""
+
+import os
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+
+
+UPLOAD_DIR = 'print_files'
+
+
+class StoredUploadedFile(UploadedFile):
+    """An uploaded file that already lives at its final storage name
+    
+    Views set ``kept`` once the file is referenced from the database;
+    anything left unkept at the end of the request should be discarded.
+    """
+    
+    def __init__(self, storage_name, path, file, name, content_type, size, charset,
+                 content_type_extra=None):
+        super().__init__(file, name, content_type, size, charset, content_type_extra)
+        self.storage_name = storage_name
+        self.path = path
+        self.kept = False
+    
+    def temporary_file_path(self):
+        return self.path
+    
+    def discard(self):
+        """Close and delete the stored file"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class SpoolFileUploadHandler(FileUploadHandler):
+    """Stream uploaded files directly into default_storage"""
+    
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        
+        storage_name, file = self.open_unique(f'{UPLOAD_DIR}/{self.file_name}')
+        self.file = StoredUploadedFile(
+            storage_name, default_storage.path(storage_name), file, self.file_name,
+            self.content_type, 0, self.charset, self.content_type_extra
+        )
+        
+        # Later handlers would only buffer a second copy of the same bytes
+        raise StopFutureHandlers()
+    
+    def receive_data_chunk(self, raw_data, start):
+        self.file.write(raw_data)
+    
+    def file_complete(self, file_size):
+        self.file.flush()
+        self.file.seek(0)
+        self.file.size = file_size
+        return self.file
+    
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.discard()
+    
+    @staticmethod
+    def open_unique(name):
+        """Create and open a new file under an unused storage name"""
+        os.makedirs(default_storage.path(UPLOAD_DIR), exist_ok=True)
+        
+        while True:
+            name = default_storage.get_available_name(name)
+            try:
+                fd = os.open(
+                    default_storage.path(name),
+                    os.O_RDWR | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0),
+                    0o644
+                )
+            except FileExistsError:
+                # Lost a race with a concurrent upload of the same name
+                continue
+            return name, os.fdopen(fd, 'wb+')
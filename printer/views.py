@@ -1,17 +1,17 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse, HttpResponse
-from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.gzip import gzip_page
 from django.views.decorators.http import require_http_methods
 from django.core.files.storage import default_storage
-from django.conf import settings
-import os
-import qrcode
 from io import BytesIO
 import json
 
 from .models import PrintHistory
-from .forms import PrintFileForm
+from .forms import PrintFileForm, ReprintForm
+from .health import health_monitor
 from .printer_utils import PrinterManager
+from .upload_handlers import UPLOAD_DIR, SpoolFileUploadHandler, StoredUploadedFile
 
 
 def home(request):
@@ -26,18 +26,137 @@ def home(request):
     return render(request, 'printer/home.html', context)
 
 
+@gzip_page
 def printer_status(request):
     """API endpoint to get printer status"""
     status = PrinterManager.get_printer_status()
     return JsonResponse(status)
 
 
+@gzip_page
+def printer_health(request):
+    """API endpoint to get uptime, error frequency and throughput per printer
+    
+    The samples live in this process's memory (printer.health), so the
+    figures only cover status checks and prints made by the process serving
+    the request. They restart empty with the process, differ between worker
+    processes, and do not include samples taken by print nodes.
+    """
+    window = request.GET.get('window')
+    try:
+        window = float(window) if window else None
+    except ValueError:
+        return JsonResponse({'error': 'window must be a number of seconds'}, status=400)
+    
+    printers = health_monitor.printers() or [PrinterManager.PRINTER_NAME]
+    return JsonResponse({
+        'printers': [
+            dict(health_monitor.summary(name, window=window),
+                 flapping=health_monitor.is_flapping(name))
+            for name in printers
+        ]
+    })
+
+
+@gzip_page
 def print_queue(request):
     """API endpoint to get print queue"""
     queue = PrinterManager.get_print_queue()
     return JsonResponse({'queue': queue})
 
 
+# PrintHistory status to record after a successful job control action
+QUEUE_ACTION_STATUS = {
+    'cancel': 'cancelled',
+    'pause': 'paused',
+    'resume': 'printing',
+    'purge': 'cancelled',
+}
+
+
+@require_http_methods(["POST"])
+def print_queue_action(request, action):
+    """API endpoint to cancel, pause, resume, reorder or purge print jobs"""
+    if action != 'purge' and action not in PrinterManager.JOB_ACTIONS:
+        return JsonResponse({
+            'success': False,
+            'message': f'Unknown queue action: {action}'
+        }, status=400)
+    
+    if action == 'purge':
+        success, message, results = PrinterManager.purge_queue()
+    else:
+        try:
+            if request.content_type == 'application/json':
+                job_ids = json.loads(request.body or b'{}').get('job_ids', [])
+            else:
+                job_ids = request.POST.getlist('job_ids')
+            # A bare string or number would otherwise iterate into other job ids
+            if not isinstance(job_ids, list) or any(isinstance(job_id, bool) for job_id in job_ids):
+                raise TypeError('job_ids must be a list')
+            job_ids = [int(job_id) for job_id in job_ids]
+        except (ValueError, TypeError, AttributeError):
+            return JsonResponse({
+                'success': False,
+                'message': 'job_ids must be a list of integers'
+            }, status=400)
+        
+        if not job_ids:
+            return JsonResponse({
+                'success': False,
+                'message': 'No job ids given'
+            }, status=400)
+        
+        results = PrinterManager.control_jobs(job_ids, action)
+        success = all(result['success'] for result in results)
+        failed = sum(1 for result in results if not result['success'])
+        message = f'{len(results) - failed} job(s) updated'
+        if failed:
+            message += f', {failed} failed'
+    
+    if action in QUEUE_ACTION_STATUS:
+        sync_history_with_queue(results, QUEUE_ACTION_STATUS[action])
+    
+    return JsonResponse({
+        'success': success,
+        'message': message,
+        'results': results,
+    })
+
+
+def sync_history_with_queue(results, status):
+    """Reflect job control results in PrintHistory
+    
+    Records are matched on their spooler job id. Jobs spooled after the
+    record was saved are matched on their document title instead: first
+    against the unique stored file name, then against the original name
+    of a record still in flight. Failed and cancelled prints are never
+    touched by the title match.
+    """
+    for result in results:
+        if not result['success']:
+            continue
+        
+        updated = PrintHistory.objects.filter(job_id=result['job_id']).update(status=status)
+        if updated or not result['document']:
+            continue
+        
+        unlinked = PrintHistory.objects.filter(job_id__isnull=True).exclude(status__in=['failed', 'cancelled'])
+        stored_names = [
+            f'{UPLOAD_DIR}/{name}' for name in PrinterManager.document_file_names(result['document'])
+        ]
+        record = (
+            unlinked.filter(file_path__in=stored_names).order_by('-timestamp').first()
+            or unlinked.filter(
+                filename=result['document'], status__in=['pending', 'printing', 'paused']
+            ).first()
+        )
+        if record:
+            record.job_id = result['job_id']
+            record.status = status
+            record.save(update_fields=['job_id', 'status'])
+
+
 def test_print(request):
     """API endpoint to print a test page"""
     success, message = PrinterManager.print_test_page()
@@ -56,9 +175,28 @@ def test_print(request):
     })
 
 
+@csrf_exempt
 @require_http_methods(["GET", "POST"])
 def upload_and_print(request):
     """Handle file upload and printing"""
+    # Stream the upload straight to its final location. The handler has to be
+    # installed before CSRF checking reads request.POST, hence the split view.
+    request.upload_handlers.insert(0, SpoolFileUploadHandler(request))
+    try:
+        return _upload_and_print(request)
+    finally:
+        # Drop every streamed file the view did not keep (CSRF or validation
+        # failure, repeated file fields, errors). Only look at uploads that
+        # were actually parsed rather than parsing the body here.
+        if hasattr(request, '_files'):
+            for _, uploaded_files in request.FILES.lists():
+                for uploaded_file in uploaded_files:
+                    if isinstance(uploaded_file, StoredUploadedFile) and not uploaded_file.kept:
+                        uploaded_file.discard()
+
+
+@csrf_protect
+def _upload_and_print(request):
     if request.method == 'POST':
         form = PrintFileForm(request.POST, request.FILES)
         
@@ -66,12 +204,15 @@ def upload_and_print(request):
             uploaded_file = form.cleaned_data['file']
             copies = form.cleaned_data['copies']
             
-            # Save the file
-            file_path = default_storage.save(
-                f'print_files/{uploaded_file.name}',
-                uploaded_file
-            )
-            full_path = os.path.join(settings.MEDIA_ROOT, file_path)
+            if isinstance(uploaded_file, StoredUploadedFile):
+                # Already written to storage by the upload handler
+                file_path = uploaded_file.storage_name
+                uploaded_file.close()
+            else:
+                file_path = default_storage.save(
+                    f'print_files/{uploaded_file.name}',
+                    uploaded_file
+                )
             
             # Create print history record
             print_record = PrintHistory.objects.create(
@@ -82,14 +223,11 @@ def upload_and_print(request):
                 copies=copies,
                 ip_address=get_client_ip(request)
             )
+            if isinstance(uploaded_file, StoredUploadedFile):
+                uploaded_file.kept = True
             
-            # Try to print the file
-            success, message = PrinterManager.print_file(full_path, copies)
-            
-            # Update print record
-            print_record.status = 'completed' if success else 'failed'
-            print_record.error_message = None if success else message
-            print_record.save()
+            # Print the file, or queue it for a print node
+            success, message = print_record.dispatch(form.cleaned_data['printer'] or None)
             
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({
@@ -110,8 +248,60 @@ def upload_and_print(request):
     return redirect('home')
 
 
+@require_http_methods(["POST"])
+def reprint(request, pk):
+    """API endpoint to print a stored file from history again"""
+    record = get_object_or_404(PrintHistory, pk=pk)
+    
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return JsonResponse({
+                'success': False,
+                'message': 'Request body must be a JSON object'
+            }, status=400)
+    else:
+        data = request.POST
+    
+    form = ReprintForm(data)
+    if not form.is_valid():
+        return JsonResponse({
+            'success': False,
+            'message': 'Form validation failed',
+            'errors': form.errors
+        }, status=400)
+    
+    try:
+        new_record, success, message = record.reprint(
+            copies=form.cleaned_data['copies'],
+            ip_address=get_client_ip(request)
+        )
+    except FileNotFoundError:
+        # The upload was purged; the client has to send the file again
+        return JsonResponse({
+            'success': False,
+            'message': 'The stored file is no longer available, please upload it again',
+            'reupload': True,
+        }, status=410)
+    
+    return JsonResponse({
+        'success': success,
+        'message': message,
+        'status': new_record.status,
+        'id': new_record.id,
+        'filename': new_record.filename,
+        'copies': new_record.copies,
+    })
+
+
 def generate_qr(request):
     """Generate QR code for the print server URL"""
+    # qrcode pulls in PIL, so only load it when a QR code is actually requested
+    import qrcode
+    
     # Get the host from request
     host = request.get_host()
     url = f"http://{host}/"
@@ -146,6 +336,7 @@ def print_history_view(request):
     return render(request, 'printer/history.html', context)
 
 
+@gzip_page
 def print_history_json(request):
     """API endpoint to get print history as JSON"""
     history = PrintHistory.objects.all()[:50]
@@ -162,7 +353,7 @@ def print_history_json(request):
             'error_message': record.error_message,
         })
     
-    return JsonResponse({'history': data})
+    return JsonResponse({'history': data}, json_dumps_params={'separators': (',', ':')})
 
 
 def get_client_ip(request):